@@ -0,0 +1,64 @@
+"""
+Admission control for expensive requests.
+
+A request is admitted while the number in flight, the depth of the embedding
+queue and the smoothed latency of recent admitted requests are all under their
+limits. When latency is over its limit, one probe request is still let through
+every probe interval so the average can recover once the load drops.
+"""
+import os
+import threading
+import time
+
+SEMANTIC_MAX_INFLIGHT = int(os.environ.get("SEMANTIC_MAX_INFLIGHT", 8))
+SEMANTIC_MAX_QUEUE_DEPTH = int(os.environ.get("SEMANTIC_MAX_QUEUE_DEPTH", 32))
+SEMANTIC_LATENCY_THRESHOLD_SECONDS = float(os.environ.get("SEMANTIC_LATENCY_THRESHOLD_SECONDS", 0.5))
+# "fallback" serves overloaded semantic searches with the keyword query, "reject" answers 503
+SEMANTIC_OVERLOAD_POLICY = os.environ.get("SEMANTIC_OVERLOAD_POLICY", "fallback")
+SEMANTIC_RETRY_AFTER_SECONDS = 2
+
+
+class AdmissionController:
+    def __init__(self, max_inflight, max_queue_depth=None, latency_threshold=None,
+                 queue_depth=None, smoothing=0.2, probe_interval=1.0):
+        self.max_inflight = max_inflight
+        self.max_queue_depth = max_queue_depth
+        self.latency_threshold = latency_threshold
+        self.queue_depth = queue_depth
+        self.smoothing = smoothing
+        self.probe_interval = probe_interval
+        self.lock = threading.Lock()
+        self.inflight = 0
+        self.latency = 0.0
+        self.last_admitted = 0.0
+        self.stats = {"admitted": 0, "rejected_inflight": 0, "rejected_queue": 0, "rejected_latency": 0}
+
+    def try_acquire(self):
+        """Admit a request, or return False if it should be shed"""
+        with self.lock:
+            now = time.monotonic()
+            if self.inflight >= self.max_inflight:
+                self.stats["rejected_inflight"] += 1
+                return False
+            if self.max_queue_depth is not None and self.queue_depth and self.queue_depth() >= self.max_queue_depth:
+                self.stats["rejected_queue"] += 1
+                return False
+            if (self.latency_threshold is not None and self.latency > self.latency_threshold
+                    and now - self.last_admitted < self.probe_interval):
+                self.stats["rejected_latency"] += 1
+                return False
+
+            self.inflight += 1
+            self.last_admitted = now
+            self.stats["admitted"] += 1
+            return True
+
+    def release(self, latency):
+        """Finish an admitted request that took latency seconds"""
+        with self.lock:
+            self.inflight -= 1
+            self.latency += self.smoothing * (latency - self.latency)
+
+    def snapshot(self):
+        with self.lock:
+            return {**self.stats, "inflight": self.inflight, "latency_seconds": self.latency}
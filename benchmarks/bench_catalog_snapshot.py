@@ -0,0 +1,82 @@
+"""
+Memory and lookup latency of the in-memory catalog snapshot, built offline
+from the synthetic catalog (datagen.py), compared with keeping one dict per
+movie. Also checks that every snapshot lookup equals the movie dict.
+
+    python benchmarks/bench_catalog_snapshot.py [--movies 100000]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from catalog_snapshot import CatalogSnapshot, FIELD_KINDS
+from datagen import generate_movies
+
+CARD_FIELDS = ["movie_id", "title", "poster_url", "imdb_rating", "release_date", "language", "genres", "runtime"]
+CARDS_PER_LOOKUP = 10
+RUNS = 20000
+
+
+def as_row(movie):
+    """A movie dict as the row the snapshot is built from"""
+    return SimpleNamespace(**{**movie, "release_date": date.fromisoformat(movie["release_date"])})
+
+
+def measure(lookup, movie_ids):
+    latencies = []
+    for movie_id in movie_ids:
+        start = time.perf_counter()
+        lookup(movie_id)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--movies", type=int, default=100000)
+    args = parser.parse_args()
+
+    movies = [{field: movie[field] for field in FIELD_KINDS} for movie in generate_movies(args.movies)]
+    rows = [as_row(movie) for movie in movies]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    snapshot = CatalogSnapshot(rows, generation="bench")
+    build_seconds = time.perf_counter() - start
+    snapshot_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Decoded from JSON so every string is its own object, as rows read from PostgreSQL are
+    encoded = json.dumps(movies)
+    tracemalloc.start()
+    by_id = {movie["movie_id"]: movie for movie in json.loads(encoded)}
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    mismatches = sum(snapshot.get(movie["movie_id"]) != movie for movie in movies)
+
+    rng = random.Random(0)
+    movie_ids = [movie["movie_id"] for movie in rng.choices(movies, k=RUNS)]
+    batches = [[movie["movie_id"] for movie in rng.choices(movies, k=CARDS_PER_LOOKUP)] for _ in range(RUNS)]
+    details = measure(snapshot.get, movie_ids)
+    cards = measure(lambda ids: snapshot.get_many(ids, CARD_FIELDS), batches)
+
+    per_100k = 100000 / args.movies / 2**20
+    print(f"{args.movies} movies, snapshot built in {build_seconds:.2f}s, {mismatches} mismatches")
+    print(f"{'memory per 100k movies':<28} {'MiB':>8}")
+    print(f"{'snapshot (traced)':<28} {snapshot_bytes * per_100k:>8.1f}")
+    print(f"{'snapshot (nbytes)':<28} {snapshot.nbytes() * per_100k:>8.1f}")
+    print(f"{'dict per movie':<28} {dict_bytes * per_100k:>8.1f}")
+    print(f"{'lookup':<28} {'p50 us':>8} {'p99 us':>8}")
+    print(f"{'details, all fields':<28} {details[0]:>8.1f} {details[1]:>8.1f}")
+    print(f"{f'{CARDS_PER_LOOKUP} cards':<28} {cards[0]:>8.1f} {cards[1]:>8.1f}")
@@ -0,0 +1,92 @@
+"""
+Before/after report for excluding embeddings from search hits and quantizing vectors.
+
+For each index given on the command line (e.g. a float32 movies_v1 and an
+int8_hnsw movies_v2 built by reindex.py), runs the list queries of the app and
+a kNN query with and without the `embedding` field in `_source` and prints
+response bytes and latency, then the store size and the estimated HNSW vector
+memory of each index. The kNN query vector is the embedding of a document of
+the first index, so every index is searched with the same vector.
+
+    python benchmarks/bench_embedding_payload.py [index ...]
+"""
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from elasticsearch import Elasticsearch
+
+from db_handler import ES_HOST, ES_USER, ES_PASSWORD, ES_INDEX, ES_SOURCE_EXCLUDES
+from query_builder import SEARCH_KNN_K, SEARCH_KNN_NUM_CANDIDATES
+
+RUNS = 50
+EMBEDDING_DIMS = 384
+
+QUERIES = {
+    "search": {"size": 10, "query": {"multi_match": {"query": "world", "fields": ["title^3", "plot_summary"]}}},
+    "trending": {"size": 10, "query": {"function_score": {"query": {"match_all": {}}, "functions": [
+        {"field_value_factor": {"field": "views", "modifier": "log1p", "factor": 0.5}}
+    ]}}},
+    "by_genre": {"size": 10, "query": {"term": {"genres": "Action"}}, "sort": [{"popularity_score": {"order": "desc"}}]},
+}
+
+
+def knn_query(vector):
+    return {"size": 10, "knn": {
+        "field": "embedding", "query_vector": vector, "k": SEARCH_KNN_K, "num_candidates": SEARCH_KNN_NUM_CANDIDATES
+    }}
+
+
+def sample_vector(es, index):
+    """Embedding of one document of index; quantized indices still return the float vector from _source"""
+    hits = es.search(index=index, size=1, query={"exists": {"field": "embedding"}}, source=["embedding"])["hits"]["hits"]
+    if not hits:
+        raise SystemExit(f"No documents with an embedding in {index}")
+    return hits[0]["_source"]["embedding"]
+
+
+def run(es, index, body):
+    sizes, latencies = [], []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        response = es.search(index=index, body=body)
+        latencies.append((time.perf_counter() - start) * 1000)
+        sizes.append(len(json.dumps(response.body)))
+    return statistics.mean(sizes), statistics.median(latencies)
+
+
+def vector_memory(es, index):
+    """Estimate in-memory HNSW vector bytes from the mapping and the document count"""
+    mapping = es.indices.get_mapping(index=index)[index]["mappings"]["properties"]["embedding"]
+    index_type = mapping.get("index_options", {}).get("type", "hnsw")
+    count = es.count(index=index)["count"]
+    bytes_per_vector = EMBEDDING_DIMS + 4 if index_type.startswith("int8") else EMBEDDING_DIMS * 4
+    return index_type, count * bytes_per_vector
+
+
+if __name__ == "__main__":
+    es = Elasticsearch(ES_HOST, basic_auth=(ES_USER, ES_PASSWORD), verify_certs=False, ssl_show_warn=False)
+
+    indices = sys.argv[1:] or [ES_INDEX]
+    vector = sample_vector(es, indices[0])
+    queries = {**QUERIES, "knn": knn_query(vector)}
+
+    print(f"{'index':>12} {'query':>10} {'full bytes':>12} {'lean bytes':>12} {'full ms':>9} {'lean ms':>9}")
+    for index in indices:
+        for name, body in queries.items():
+            full_bytes, full_ms = run(es, index, body)
+            lean_bytes, lean_ms = run(es, index, {**body, "_source": {"excludes": ES_SOURCE_EXCLUDES}})
+            print(f"{index:>12} {name:>10} {full_bytes:>12.0f} {lean_bytes:>12.0f} {full_ms:>9.2f} {lean_ms:>9.2f}")
+
+    print()
+    print(f"{'index':>12} {'vectors':>10} {'store MiB':>10} {'vector MiB':>11}")
+    for index in indices:
+        stats = es.indices.stats(index=index, metric="store")
+        store = stats["_all"]["primaries"]["store"]["size_in_bytes"]
+        for name in stats["indices"]:
+            index_type, memory = vector_memory(es, name)
+            print(f"{name:>12} {index_type:>10} {store / 2**20:>10.1f} {memory / 2**20:>11.1f}")
@@ -0,0 +1,71 @@
+"""
+Latency of cheap routes while semantic searches run in the same process.
+
+Start the app once with EMBEDDING_WORKERS=0 (encode in the request thread) and
+once with the default worker pool, then run this against each:
+
+    EMBEDDING_WORKERS=0 python movapp.py   # baseline
+    python movapp.py                       # worker pool
+    python benchmarks/bench_mixed_workload.py [base_url]
+"""
+import sys
+import threading
+import time
+
+import requests
+
+SEMANTIC_CLIENTS = 8
+CHEAP_REQUESTS = 200
+CHEAP_ROUTES = ["/api/genres", "/api/movies/mov_1"]
+SEMANTIC_QUERIES = ["a scientist saves humanity", "heist gone wrong", "haunted detective", "magical forest"]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def measure_cheap(base_url):
+    latencies = []
+    for i in range(CHEAP_REQUESTS):
+        start = time.perf_counter()
+        requests.get(base_url + CHEAP_ROUTES[i % len(CHEAP_ROUTES)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def semantic_load(base_url, stop, latencies):
+    i = 0
+    while not stop.is_set():
+        query = SEMANTIC_QUERIES[i % len(SEMANTIC_QUERIES)] + f" {i}"
+        start = time.perf_counter()
+        requests.get(f"{base_url}/api/movies/search", params={"query": query, "semantic": "true"})
+        latencies.append((time.perf_counter() - start) * 1000)
+        i += 1
+
+
+def report(name, latencies):
+    print(f"{name:<28} p50 {percentile(latencies, 50):>8.1f} ms  p99 {percentile(latencies, 99):>8.1f} ms")
+
+
+if __name__ == "__main__":
+    base_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:5002"
+
+    report("cheap routes, idle", measure_cheap(base_url))
+
+    stop = threading.Event()
+    semantic_latencies = []
+    clients = [
+        threading.Thread(target=semantic_load, args=(base_url, stop, semantic_latencies))
+        for _ in range(SEMANTIC_CLIENTS)
+    ]
+    for client in clients:
+        client.start()
+    time.sleep(1)
+    cheap_under_load = measure_cheap(base_url)
+    stop.set()
+    for client in clients:
+        client.join()
+
+    report("cheap routes, semantic load", cheap_under_load)
+    report("semantic search", semantic_latencies)
@@ -0,0 +1,57 @@
+"""
+Latency of loading a movie page the old way (details, then recommendations,
+then play counts, one request after the other) versus the composite
+/api/movies/<id>/page endpoint, with the fragment cache cold and warm.
+
+Start the app first (python movapp.py), then:
+
+    python benchmarks/bench_movie_page.py [base_url]
+"""
+import statistics
+import sys
+import time
+
+import requests
+
+MOVIES = 50
+
+
+def timed(session, urls):
+    start = time.perf_counter()
+    for url in urls:
+        session.get(url).raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+def report(label, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{label:<30} {statistics.median(latencies):>8.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    base_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:5002"
+    session = requests.Session()
+    trending = session.get(f"{base_url}/api/trending", params={"size": MOVIES, "fields": "movie_id"}).json()
+    movie_ids = [hit["_source"]["movie_id"] for hit in trending]
+
+    sequential = [
+        timed(session, [
+            f"{base_url}/api/movies/{movie_id}",
+            f"{base_url}/api/recommendations/{movie_id}?size=3",
+            f"{base_url}/api/cassandra/top10_this_week",
+        ])
+        for movie_id in movie_ids
+    ]
+    # The first pass fills the fragment cache, the second is served from it
+    cold = [timed(session, [f"{base_url}/api/movies/{movie_id}/page"]) for movie_id in movie_ids]
+    warm = [timed(session, [f"{base_url}/api/movies/{movie_id}/page"]) for movie_id in movie_ids]
+    rendered = [timed(session, [f"{base_url}/movie/{movie_id}"]) for movie_id in movie_ids]
+
+    print(f"{len(movie_ids)} movies")
+    print(f"{'path':<30} {'p50 ms':>8} {'p95 ms':>8}")
+    report("sequential requests", sequential)
+    report("composite, cold cache", cold)
+    report("composite, warm cache", warm)
+    report("server render, warm cache", rendered)
+    print(session.get(f"{base_url}/api/fragments/stats").json())
@@ -0,0 +1,58 @@
+"""
+Write amplification of resume-position heartbeats with and without server-side
+coalescing.
+
+Simulates many concurrent viewers whose players send a heartbeat on every
+timeupdate (~4 per second) and counts the Cassandra writes the coalescer would
+issue, on a simulated clock.
+
+    python benchmarks/bench_playback_writes.py
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from playback import PositionCoalescer, PLAYBACK_FLUSH_INTERVAL_SECONDS
+
+HEARTBEATS_PER_SECOND = 4
+SIMULATED_SECONDS = 600
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def simulate(viewers, seed=7):
+    rng = random.Random(seed)
+    clock = SimulatedClock()
+    writes = []
+    coalescer = PositionCoalescer(lambda *args: writes.append(args), clock=clock)
+    # Viewers start at different offsets within the first heartbeat tick
+    offsets = [rng.random() / HEARTBEATS_PER_SECOND for _ in range(viewers)]
+
+    ticks = SIMULATED_SECONDS * HEARTBEATS_PER_SECOND
+    for tick in range(ticks):
+        for viewer, offset in enumerate(offsets):
+            clock.now = tick / HEARTBEATS_PER_SECOND + offset
+            final = tick == ticks - 1
+            coalescer.record(f"user_{viewer}", "mov_1", clock.now, 7200.0, clock.now * 1000, final=final)
+        if tick % HEARTBEATS_PER_SECOND == 0:
+            coalescer.flush_due()
+    coalescer.flush_due(flush_all=True)
+    return coalescer.stats["heartbeats"], len(writes)
+
+
+if __name__ == "__main__":
+    print(f"flush interval {PLAYBACK_FLUSH_INTERVAL_SECONDS}s, {HEARTBEATS_PER_SECOND} heartbeats/s, "
+          f"{SIMULATED_SECONDS}s of playback")
+    print(f"{'viewers':>8} {'heartbeats':>11} {'writes':>8} {'writes/s':>9} {'reduction':>10}")
+    for viewers in (100, 1_000, 10_000):
+        heartbeats, writes = simulate(viewers)
+        print(f"{viewers:>8} {heartbeats:>11} {writes:>8} {writes / SIMULATED_SECONDS:>9.1f} "
+              f"{heartbeats / writes:>9.1f}x")
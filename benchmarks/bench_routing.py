@@ -0,0 +1,91 @@
+"""
+Shards touched and latency of searches against a movies index routed by
+language versus one that is not.
+
+Loads the same synthetic multi-language catalog (datagen.py, without
+embeddings) into two scratch indices, then runs language-filtered and
+unfiltered searches against both and reports the shards each query hit
+(_shards.total) with p50/p95 latency. The scratch indices are deleted at the
+end unless --keep is given.
+
+    python benchmarks/bench_routing.py [--movies 200000] [--keep]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from elasticsearch import helpers
+
+from datagen import generate_movies, LANGUAGES
+from db_handler import DatabaseManager, language_routing
+from query_builder import build_search_params, build_search_body
+
+RUNS = 200
+INDICES = {"bench_movies_flat": False, "bench_movies_routed": True}
+QUERIES = {
+    "language filter": lambda language: ({"language": [language]}, "kingdom"),
+    "language + genre filter": lambda language: ({"language": [language], "genres": ["Drama"]}, None),
+    "unfiltered": lambda language: ({}, "kingdom"),
+}
+
+
+def load(es, index, routed, movies):
+    def actions():
+        for movie in generate_movies(movies):
+            action = {"_index": index, "_id": movie["movie_id"], "_source": movie}
+            if routed:
+                action["_routing"] = language_routing(movie["language"])
+            yield action
+
+    for _ in helpers.streaming_bulk(es, actions(), chunk_size=2000):
+        pass
+    es.indices.refresh(index=index)
+
+
+def measure(es, index, routed, build):
+    shards, latencies = [], []
+    for i in range(RUNS):
+        language = LANGUAGES[i % len(LANGUAGES)]
+        filters, query = build(language)
+        languages = filters.get("language")
+        routing = ",".join(sorted({language_routing(lang) for lang in languages})) if routed and languages else None
+        body = build_search_body(build_search_params(query, filters=filters, source={"includes": ["movie_id"]}))
+        start = time.perf_counter()
+        response = es.search(index=index, body=body, routing=routing, request_cache=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+        shards.append(response["_shards"]["total"])
+    latencies.sort()
+    return statistics.mean(shards), statistics.median(latencies), latencies[int(len(latencies) * 0.95)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--movies", type=int, default=200000)
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager()
+    es = db_manager.es
+    try:
+        for index, routed in INDICES.items():
+            es.indices.delete(index=index, ignore_unavailable=True)
+            body = db_manager.get_index_body(routed=routed)
+            body["settings"]["index"]["number_of_replicas"] = 0
+            es.indices.create(index=index, body=body)
+            start = time.perf_counter()
+            load(es, index, routed, args.movies)
+            print(f"Loaded {args.movies} movies into {index} in {time.perf_counter() - start:.1f}s")
+
+        print(f"{'query':<26} {'index':<20} {'shards':>7} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, build in QUERIES.items():
+            for index, routed in INDICES.items():
+                shards, p50, p95 = measure(es, index, routed, build)
+                print(f"{name:<26} {index:<20} {shards:>7.1f} {p50:>8.2f} {p95:>8.2f}")
+    finally:
+        if not args.keep:
+            for index in INDICES:
+                es.indices.delete(index=index, ignore_unavailable=True)
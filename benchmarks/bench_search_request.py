@@ -0,0 +1,46 @@
+"""
+Client-side cost of a search request: building and serializing the full
+search body versus only the stored template id and its parameters.
+
+Runs offline; no cluster needed.
+
+    python benchmarks/bench_search_request.py
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from query_builder import SEARCH_TEMPLATE_ID, build_search_params, build_search_body
+
+RUNS = 20000
+SOURCE = {"includes": ["movie_id", "title", "poster_url", "imdb_rating", "release_date", "language", "genres", "runtime"]}
+CASES = {
+    "browse": {},
+    "keyword + filters": {
+        "query": "lost kingdom",
+        "filters": {"genres": ["Action", "Drama"], "language": ["English"], "content_rating": "PG-13"},
+        "year_from": "1990", "year_to": "2010",
+    },
+    "semantic": {"query": "lost kingdom", "query_vector": [0.0123456789] * 384},
+}
+
+
+def full_body(case):
+    return json.dumps(build_search_body(build_search_params(**case, source=SOURCE)))
+
+
+def template_request(case):
+    return json.dumps({"id": SEARCH_TEMPLATE_ID, "params": build_search_params(**case, source=SOURCE)})
+
+
+if __name__ == '__main__':
+    print(f"{'case':<20} {'body bytes':>11} {'template bytes':>15} {'body us':>9} {'template us':>12}")
+    for name, case in CASES.items():
+        runs = RUNS // 20 if "query_vector" in case else RUNS
+        body_us = timeit.timeit(lambda: full_body(case), number=runs) / runs * 1e6
+        template_us = timeit.timeit(lambda: template_request(case), number=runs) / runs * 1e6
+        print(f"{name:<20} {len(full_body(case)):>11} {len(template_request(case)):>15} "
+              f"{body_us:>9.1f} {template_us:>12.1f}")
@@ -0,0 +1,44 @@
+"""
+Payload size and latency of the list endpoints with their default card
+projection versus fields=all.
+
+Start the app first (python movapp.py), then:
+
+    python benchmarks/bench_sparse_fields.py [base_url]
+"""
+import statistics
+import sys
+import time
+
+import requests
+
+RUNS = 50
+
+ENDPOINTS = [
+    "/api/movies/search?query=world&size=20",
+    "/api/trending?size=20",
+    "/api/movies/by-genre/Action?size=20",
+    "/api/recommendations/mov_1?size=20",
+    "/api/cassandra/top10_this_week",
+]
+
+
+def measure(url):
+    sizes, latencies = [], []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        response = requests.get(url)
+        latencies.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+        sizes.append(len(response.content))
+    return statistics.mean(sizes), statistics.median(latencies)
+
+
+if __name__ == "__main__":
+    base_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:5002"
+    print(f"{'endpoint':<42} {'all bytes':>10} {'card bytes':>11} {'all ms':>8} {'card ms':>8}")
+    for endpoint in ENDPOINTS:
+        separator = "&" if "?" in endpoint else "?"
+        all_bytes, all_ms = measure(f"{base_url}{endpoint}{separator}fields=all")
+        card_bytes, card_ms = measure(f"{base_url}{endpoint}")
+        print(f"{endpoint:<42} {all_bytes:>10.0f} {card_bytes:>11.0f} {all_ms:>8.2f} {card_ms:>8.2f}")
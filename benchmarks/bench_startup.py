@@ -0,0 +1,49 @@
+"""
+Measure how long the app takes to answer /healthz and to report ready on /readyz.
+
+The app runs with FLASK_DEBUG=0, so the reloader's second start isn't measured,
+in its own process group, which is killed as a whole afterwards.
+
+    python benchmarks/bench_startup.py
+"""
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import requests
+
+BASE_URL = "http://localhost:5002"
+TIMEOUT_SECONDS = 120
+
+
+def wait_for(path, expected_status):
+    while time.perf_counter() - start < TIMEOUT_SECONDS:
+        try:
+            response = requests.get(BASE_URL + path, timeout=1)
+            if response.status_code == expected_status:
+                return time.perf_counter() - start, response.json()
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.05)
+    raise Exception(f"{path} did not return {expected_status} within {TIMEOUT_SECONDS}s")
+
+
+if __name__ == "__main__":
+    app_path = os.path.join(os.path.dirname(__file__), "..", "movapp.py")
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, app_path], env={**os.environ, "FLASK_DEBUG": "0"},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+    )
+    try:
+        healthy_after, _ = wait_for("/healthz", 200)
+        ready_after, readiness = wait_for("/readyz", 200)
+        print(f"healthz after {healthy_after:.2f}s, readyz after {ready_after:.2f}s "
+              f"(budget {readiness['startup_budget_seconds']}s)")
+        for name, status in readiness["backends"].items():
+            print(f"  {name:<14} {status['seconds']:.2f}s")
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
@@ -0,0 +1,58 @@
+"""
+Compare peak memory and time of the old sort-everything top 10 against the
+bounded heap used by DatabaseManager.get_top_movies_for_bucket.
+
+Rows are produced lazily, the way a paged Cassandra ResultSet hands them out.
+
+    python benchmarks/bench_topk.py
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from trending import top_k_plays
+
+Row = namedtuple("Row", ["movie_id", "play_count"])
+
+
+def paged_rows(num_movies, seed=42):
+    rng = random.Random(seed)
+    for i in range(num_movies):
+        yield Row(f"mov_{i}", rng.randint(1, 1000000))
+
+
+def sort_all(rows, k=10):
+    """The previous top10_this_week implementation"""
+    return sorted(
+        [{"movie_id": str(row.movie_id), "play_count": row.play_count} for row in rows],
+        key=lambda x: x['play_count'],
+        reverse=True
+    )[:k]
+
+
+def measure(fn, num_movies):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(paged_rows(num_movies))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+if __name__ == "__main__":
+    print(f"{'movies':>10} {'method':>8} {'peak KiB':>12} {'seconds':>9}")
+    for num_movies in (10_000, 100_000, 1_000_000):
+        expected = None
+        for name, fn in (("sort", sort_all), ("heap", top_k_plays)):
+            result, elapsed, peak = measure(fn, num_movies)
+            counts = [movie["play_count"] for movie in result]
+            if expected is None:
+                expected = counts
+            assert counts == expected, "heap and sort disagree"
+            print(f"{num_movies:>10} {name:>8} {peak / 1024:>12.1f} {elapsed:>9.3f}")
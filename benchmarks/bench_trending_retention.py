@@ -0,0 +1,160 @@
+"""
+Disk footprint and top10_all_time read cost of trending play counts over a
+simulated multi-year event history, kept forever (the previous layout) or
+with weekly TTLs and monthly/yearly rollups (trending_rollup.py).
+
+Play events come from datagen.py. Tables are modelled in memory with per-row
+expiry, and TrendingRollup and DatabaseManager.get_top_movies_all_time run
+against that model unchanged, so the rows read per top-10 and the rollup
+schedule are the real ones. Disk is estimated from the cells of the live rows
+(trending_top adds TRENDING_TOP_K rows per week and is left out); expired
+rows are dropped as compaction would drop them.
+
+    python benchmarks/bench_trending_retention.py [--years 4 --movies 20000 --events-per-week 200000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from datagen import iter_play_chunks
+from db_handler import DatabaseManager
+from trending import bucket_end, period_end, ttl_until, TRENDING_MONTHLY_TTL_SECONDS
+from trending_rollup import TrendingRollup
+
+# Approximate cell headers, timestamps and TTLs per row in an uncompressed SSTable
+ROW_OVERHEAD_BYTES = 24
+READ_RUNS = 5
+
+
+class SimulatedTrendingStore:
+    """The trending tables as dicts of partition -> movie_id -> (play_count, expires_at)"""
+
+    get_top_movies_all_time = DatabaseManager.get_top_movies_all_time
+
+    def __init__(self):
+        self.now = None
+        self.tables = defaultdict(lambda: defaultdict(dict))
+        self.rollups = {"month": set(), "year": set()}
+        self.rows_read = 0
+
+    def write_bucket(self, bucket, counts):
+        # Counters don't expire; trending_rollup.py deletes them past retention
+        partition = self.tables["trending_counts"][bucket]
+        for movie_id, play_count in counts.items():
+            partition[movie_id] = (play_count, None)
+
+    def expire(self):
+        """Drop expired rows and emptied partitions"""
+        for partitions in self.tables.values():
+            for key in list(partitions):
+                live = {m: v for m, v in partitions[key].items() if v[1] is None or v[1] > self.now}
+                if live:
+                    partitions[key] = live
+                else:
+                    del partitions[key]
+
+    def get_rolled_up_periods(self):
+        return {granularity: set(periods) for granularity, periods in self.rollups.items()}
+
+    def get_trending_buckets(self):
+        return list(self.tables["trending_counts"])
+
+    def scan_play_counts(self, partitions):
+        for table, _, key in partitions:
+            for movie_id, (play_count, expires) in self.tables[table].get(key, {}).items():
+                if expires is None or expires > self.now:
+                    self.rows_read += 1
+                    yield movie_id, play_count
+
+    def rollup_period(self, granularity, period, partitions, now=None):
+        totals = defaultdict(int)
+        for movie_id, play_count in self.scan_play_counts(partitions):
+            totals[movie_id] += play_count
+        expires = None
+        if granularity == "month":
+            expires = now + timedelta(seconds=ttl_until(period_end(period), TRENDING_MONTHLY_TTL_SECONDS, now))
+        table = self.tables["trending_monthly" if granularity == "month" else "trending_yearly"]
+        table[period] = {movie_id: (play_count, expires) for movie_id, play_count in totals.items()}
+        self.rollups[granularity].add(period)
+        return len(totals)
+
+    def drop_bucket(self, bucket):
+        self.tables["trending_counts"].pop(bucket, None)
+
+    def footprint(self):
+        """(live rows, estimated bytes)"""
+        rows = size = 0
+        for partitions in self.tables.values():
+            for key, partition in partitions.items():
+                rows += len(partition)
+                size += sum(len(key) + len(movie_id) + 8 + ROW_OVERHEAD_BYTES for movie_id in partition)
+        return rows, size
+
+    def measure_top10(self):
+        latencies = []
+        for _ in range(READ_RUNS):
+            self.rows_read = 0
+            start = time.perf_counter()
+            top = self.get_top_movies_all_time(10)
+            latencies.append((time.perf_counter() - start) * 1000)
+        return top, self.rows_read, statistics.median(latencies)
+
+
+def weekly_counts(movies, weeks, events_per_week, start):
+    """(bucket, plays per movie number) per bucket; the week of New Year's Day gives two"""
+    current, counts = None, None
+    for bucket, movie_numbers, _ in iter_play_chunks(movies, weeks, events_per_week, start):
+        if bucket != current:
+            if current is not None:
+                yield current, counts
+            current, counts = bucket, np.zeros(movies + 1, dtype=np.int64)
+        counts += np.bincount(movie_numbers, minlength=movies + 1)
+    if current is not None:
+        yield current, counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=4)
+    parser.add_argument("--movies", type=int, default=20000)
+    parser.add_argument("--events-per-week", type=int, default=200000)
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2021, 1, 3))
+    args = parser.parse_args()
+
+    # Both stores get the same plays; only the retained one is rolled up and pruned
+    forever = SimulatedTrendingStore()
+    retained = SimulatedTrendingStore()
+    rollup = TrendingRollup(retained)
+    weeks = args.years * 52
+
+    print(f"{args.years} years, {args.movies} movies, {args.events_per_week} plays per week")
+    print(f"{'at':<12} {'layout':<10} {'rows':>10} {'est. MiB':>9} {'rows read':>10} {'top10 ms':>9}")
+    buckets = list(weekly_counts(args.movies, weeks, args.events_per_week, args.start))
+    for index, (bucket, counts) in enumerate(buckets, 1):
+        played = {f"mov_{n}": int(counts[n]) for n in np.flatnonzero(counts)}
+        now = bucket_end(bucket)
+        for store in (forever, retained):
+            store.now = now
+            store.write_bucket(bucket, played)
+        # The rollup job runs at least daily; once a week is enough at week granularity
+        rollup.run_once(now)
+        retained.expire()
+
+        if index == len(buckets) or bucket[:4] != buckets[index][0][:4]:
+            results = []
+            for name, store in (("forever", forever), ("retained", retained)):
+                top, rows_read, ms = store.measure_top10()
+                rows, size = store.footprint()
+                results.append(top)
+                print(f"{now.date().isoformat():<12} {name:<10} {rows:>10} {size / 2**20:>9.1f} "
+                      f"{rows_read:>10} {ms:>9.1f}")
+            assert results[0] == results[1], "rollups changed the all-time top 10"
+    print(f"rollups: {rollup.stats['months']} months, {rollup.stats['years']} years")
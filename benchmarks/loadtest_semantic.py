@@ -0,0 +1,62 @@
+"""
+Load test for semantic search admission control.
+
+Runs a ramp of concurrent clients issuing semantic=true searches and reports
+latency percentiles and which mode served each response (semantic,
+keyword_fallback or rejected). With admission control p99 should stay bounded
+as concurrency grows, with the excess shifted to the fallback path.
+
+    python benchmarks/loadtest_semantic.py [base_url]
+"""
+import sys
+import threading
+import time
+from collections import Counter
+
+import requests
+
+DURATION_SECONDS = 20
+CONCURRENCY_STEPS = [1, 4, 16, 64]
+QUERIES = ["a scientist saves humanity", "heist gone wrong", "haunted detective", "magical forest"]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+
+def client(base_url, stop, latencies, modes, lock):
+    session = requests.Session()
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = session.get(f"{base_url}/api/movies/search", params={
+            "query": f"{QUERIES[i % len(QUERIES)]} {i}", "semantic": "true"
+        })
+        elapsed = (time.perf_counter() - start) * 1000
+        mode = response.headers.get("X-Search-Mode", "rejected" if response.status_code == 503 else "error")
+        with lock:
+            latencies.append(elapsed)
+            modes[mode] += 1
+        i += 1
+
+
+if __name__ == "__main__":
+    base_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:5002"
+    print(f"{'clients':>8} {'reqs':>6} {'p50 ms':>8} {'p99 ms':>8}  modes")
+    for concurrency in CONCURRENCY_STEPS:
+        stop = threading.Event()
+        lock = threading.Lock()
+        latencies, modes = [], Counter()
+        threads = [
+            threading.Thread(target=client, args=(base_url, stop, latencies, modes, lock))
+            for _ in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(DURATION_SECONDS)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        print(f"{concurrency:>8} {len(latencies):>6} {percentile(latencies, 50):>8.1f} "
+              f"{percentile(latencies, 99):>8.1f}  {dict(modes)}")
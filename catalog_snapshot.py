@@ -0,0 +1,227 @@
+"""
+Read-only in-memory snapshot of the movie catalog.
+
+Columns are kept in numpy arrays instead of one dict per movie:
+- free text (titles, summaries, URLs) as one UTF-8 buffer with offsets
+- repeated strings (director, language, genres, cast, ...) as integer codes
+  into a table holding each distinct string once
+- numbers and dates as typed arrays, with a null mask where needed
+
+Apart from the movie_id -> row index, no Python object is kept per movie, so
+a snapshot built before a server forks its workers stays shared between them:
+reads don't touch reference counts in the column arrays and their pages are
+never copied. Lookups decode only the requested fields of the requested
+movies and return the same dicts as DatabaseManager.movie_to_dict.
+
+Play counts change views and popularity_score all the time without moving the
+catalog generation, so those columns can be replaced on their own
+(update_columns) instead of rebuilding the snapshot.
+"""
+import sys
+from array import array
+from itertools import accumulate, islice
+from datetime import date
+
+import numpy as np
+
+EPOCH = date(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+# Rows turned into columns at a time while building
+SNAPSHOT_BATCH_SIZE = 10000
+# Numeric fields the play fold keeps changing
+VOLATILE_FIELDS = ("views", "popularity_score")
+
+# How each catalog field is stored
+FIELD_KINDS = {
+    "movie_id": "text",
+    "title": "text",
+    "plot_summary": "text",
+    "release_date": "date",
+    "runtime": "int",
+    "budget": "float",
+    "revenue": "float",
+    "genres": "codes",
+    "production_companies": "codes",
+    "cast": "codes",
+    "director": "code",
+    "keywords": "codes",
+    "streaming_url": "text",
+    "trailer_url": "text",
+    "poster_url": "text",
+    "imdb_rating": "float",
+    "content_rating": "code",
+    "language": "code",
+    "popularity_score": "float",
+    "views": "int",
+    "average_rating": "float",
+}
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+class _ColumnBuilder:
+    def __init__(self, kind, strings):
+        self.kind = kind
+        self.strings = strings
+        self.nulls = bytearray()
+        self.offsets = array("q", [0])
+        if kind == "text":
+            self.values = bytearray()
+        elif kind in ("code", "codes"):
+            self.values = array("I")
+        elif kind == "float":
+            self.values = array("d")
+        else:
+            self.values = array("q")
+
+    def extend_offsets(self, lengths):
+        offsets = accumulate(lengths, initial=self.offsets[-1])
+        next(offsets)
+        self.offsets.extend(offsets)
+
+    def extend(self, values):
+        """Append one column of a batch of rows"""
+        self.nulls += bytes(value is None for value in values)
+        strings = self.strings
+        if self.kind == "text":
+            encoded = [(value or "").encode("utf-8") for value in values]
+            self.values += b"".join(encoded)
+            self.extend_offsets(map(len, encoded))
+        elif self.kind == "code":
+            self.values.extend(strings.setdefault(value or "", len(strings)) for value in values)
+        elif self.kind == "codes":
+            self.values.extend(strings.setdefault(item, len(strings)) for value in values for item in value or ())
+            self.extend_offsets([len(value) if value else 0 for value in values])
+        elif self.kind == "date":
+            self.values.extend((value - EPOCH).days if value is not None else 0 for value in values)
+        elif self.kind == "float":
+            self.values.extend(value if value is not None else 0.0 for value in values)
+        else:
+            self.values.extend(value if value is not None else 0 for value in values)
+
+    def build(self):
+        nulls = np.frombuffer(bytes(self.nulls), dtype=np.bool_)
+        if self.kind == "text":
+            values = bytes(self.values)
+        elif self.kind in ("code", "codes"):
+            # A catalog has few distinct strings of these fields, so 16-bit codes usually do
+            values = np.frombuffer(self.values, dtype=np.uint32)
+            if len(self.strings) <= np.iinfo(np.uint16).max:
+                values = values.astype(np.uint16)
+        elif self.kind == "float":
+            values = np.frombuffer(self.values, dtype=np.float64).copy()
+        else:
+            values = np.frombuffer(self.values, dtype=np.int64).astype(np.int32)
+        offsets = None
+        if self.kind in ("text", "codes"):
+            offsets = np.frombuffer(self.offsets, dtype=np.int64)
+            offsets = memoryview(offsets.astype(np.uint32 if offsets[-1] <= np.iinfo(np.uint32).max else np.int64))
+        # Reads go through memoryviews, which index to plain Python values much faster than numpy
+        return {
+            "kind": self.kind,
+            "values": values if self.kind == "text" else memoryview(values),
+            "offsets": offsets,
+            "nulls": memoryview(nulls) if nulls.any() else None,
+        }
+
+
+class CatalogSnapshot:
+    def __init__(self, rows, generation=None, fields=tuple(FIELD_KINDS)):
+        """Build from rows with the catalog fields as attributes; the first row of a movie_id wins"""
+        self.generation = generation
+        self.fields = list(fields)
+        strings = {"": 0}
+        # movie_id is the key of the positions index, so it isn't stored again as a column
+        builders = {field: _ColumnBuilder(FIELD_KINDS[field], strings) for field in self.fields if field != "movie_id"}
+        self.positions = {}
+        for batch in batched(rows, SNAPSHOT_BATCH_SIZE):
+            fresh = []
+            for row in batch:
+                if row.movie_id not in self.positions:
+                    self.positions[row.movie_id] = len(self.positions)
+                    fresh.append(row)
+            for field, builder in builders.items():
+                builder.extend([getattr(row, field) for row in fresh])
+        self.columns = {field: builder.build() for field, builder in builders.items()}
+        self.strings = [sys.intern(value) for value in strings]
+        self.updated_at = None
+
+    def update_columns(self, rows, fields=VOLATILE_FIELDS):
+        """Replace numeric columns from rows with movie_id and fields; other movies keep their values"""
+        updated = {}
+        for field in fields:
+            column = self.columns[field]
+            nulls = column["nulls"]
+            updated[field] = (
+                np.array(column["values"]),
+                np.array(nulls) if nulls is not None else np.zeros(len(self), dtype=np.bool_),
+            )
+        seen = set()
+        for row in rows:
+            i = self.positions.get(row.movie_id)
+            # The first row of a movie_id wins, as when building
+            if i is None or i in seen:
+                continue
+            seen.add(i)
+            for field, (values, nulls) in updated.items():
+                value = getattr(row, field)
+                nulls[i] = value is None
+                values[i] = value if value is not None else 0
+        # Each column is swapped whole, so readers see either its old or its new values
+        for field, (values, nulls) in updated.items():
+            self.columns[field] = {
+                **self.columns[field],
+                "values": memoryview(values),
+                "nulls": memoryview(nulls) if nulls.any() else None,
+            }
+        return len(seen)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def decode(self, column, i):
+        if column["nulls"] is not None and column["nulls"][i]:
+            return None
+        kind, values = column["kind"], column["values"]
+        if kind == "text":
+            return str(values[column["offsets"][i]:column["offsets"][i + 1]], "utf-8")
+        if kind == "code":
+            return self.strings[values[i]]
+        if kind == "codes":
+            return [self.strings[code] for code in values[column["offsets"][i]:column["offsets"][i + 1]]]
+        if kind == "date":
+            return date.fromordinal(EPOCH_ORDINAL + values[i]).isoformat()
+        return values[i]
+
+    def get(self, movie_id, fields=None):
+        """A movie as a dict of the given fields, or None if the snapshot doesn't have it"""
+        i = self.positions.get(movie_id)
+        if i is None:
+            return None
+        return {
+            field: movie_id if field == "movie_id" else self.decode(self.columns[field], i)
+            for field in fields or self.fields
+        }
+
+    def get_many(self, movie_ids, fields=None):
+        """Movies keyed by movie_id; ids not in the snapshot are left out"""
+        movies = {}
+        for movie_id in movie_ids:
+            movie = self.get(movie_id, fields)
+            if movie is not None:
+                movies[movie_id] = movie
+        return movies
+
+    def nbytes(self):
+        """Approximate memory held by the snapshot"""
+        total = sum(sys.getsizeof(value) for value in self.strings)
+        total += sys.getsizeof(self.positions) + sum(sys.getsizeof(movie_id) for movie_id in self.positions)
+        for column in self.columns.values():
+            for part in (column["values"], column["offsets"], column["nulls"]):
+                if part is not None:
+                    total += memoryview(part).nbytes
+        return total
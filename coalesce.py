@@ -0,0 +1,142 @@
+"""
+Single-flight request coalescing with stale-while-revalidate.
+
+Concurrent callers asking for the same key share one in-flight computation.
+A result is served from memory while fresh; once it goes stale it is still
+served for a while, and one background refresh replaces it. With a shared
+directory, worker processes on the same host also share results: the first
+process to take the per-key file lock computes, the others read its result.
+With max_entries, the least recently used results are dropped past that many
+keys.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+COALESCE_SHARED_DIR = os.environ.get("COALESCE_SHARED_DIR")
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, shared_dir=COALESCE_SHARED_DIR, max_entries=None):
+        self.shared_dir = shared_dir
+        self.max_entries = max_entries
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.calls = {}
+        self.stats = {
+            "hits": 0,
+            "stale_served": 0,
+            "coalesced_waits": 0,
+            "computations": 0,
+            "shared_hits": 0,
+            "refreshes": 0,
+            "errors": 0,
+        }
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {**self.stats, "entries": len(self.entries)}
+
+    def get(self, key, compute, ttl, stale_ttl=0):
+        """Return the cached value of key, computing it at most once across concurrent callers"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and now < entry[1]:
+                self.stats["hits"] += 1
+                self.entries.move_to_end(key)
+                return entry[0]
+
+            if entry and now < entry[2]:
+                self.stats["stale_served"] += 1
+                if key not in self.calls:
+                    call = self.calls[key] = _Call()
+                    self.stats["refreshes"] += 1
+                    threading.Thread(
+                        target=self.refresh, args=(key, compute, ttl, stale_ttl, call), daemon=True
+                    ).start()
+                return entry[0]
+
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+            else:
+                self.stats["coalesced_waits"] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error:
+                raise call.error
+            return call.value
+
+        self.run(key, compute, ttl, stale_ttl, call)
+        if call.error:
+            raise call.error
+        return call.value
+
+    def refresh(self, key, compute, ttl, stale_ttl, call):
+        self.run(key, compute, ttl, stale_ttl, call)
+        if call.error:
+            print(f"Background refresh of {key} failed, serving stale value: {str(call.error)}")
+
+    def run(self, key, compute, ttl, stale_ttl, call):
+        try:
+            value = self.compute_shared(key, compute, ttl) if self.shared_dir else self.compute(compute)
+            now = time.monotonic()
+            with self.lock:
+                self.entries[key] = (value, now + ttl, now + ttl + stale_ttl)
+                self.entries.move_to_end(key)
+                if self.max_entries is not None:
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+            call.value = value
+        except Exception as e:
+            # Failures are never cached; the next caller computes again
+            self.count("errors")
+            call.error = e
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+            call.event.set()
+
+    def compute(self, compute):
+        self.count("computations")
+        return compute()
+
+    def compute_shared(self, key, compute, ttl):
+        """Compute under a per-key file lock so only one process on the host does the work"""
+        path = os.path.join(self.shared_dir, hashlib.sha1(key.encode("utf-8")).hexdigest())
+        with open(path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if os.path.exists(path) and time.time() - os.path.getmtime(path) < ttl:
+                    with open(path) as f:
+                        self.count("shared_hits")
+                        return json.load(f)
+
+                value = self.compute(compute)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(value, f)
+                os.replace(tmp_path, path)
+                return value
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,401 @@
+"""
+Deterministic synthetic catalog and play-event generator.
+
+Movies are generated in fixed-size chunks of numpy columns, each chunk from
+its own seeded generator, so output is identical for a given seed whatever
+the total count, and memory stays constant while millions of movies stream to
+disk. Play events follow a Zipfian popularity over the catalog, with part of
+the ranking reshuffled every week so trending movies change between buckets.
+
+Output is NDJSON (one movie or event per line, in the shape load_sample_data
+and /api/cassandra/movie take) or a directory of columnar .npz chunks.
+
+    python datagen.py movies --count 1000000 --out data/movies.ndjson
+    python datagen.py plays --movies 1000000 --weeks 8 --events-per-week 5000000 --out data/plays --format npz
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from trending import week_bucket
+
+DATAGEN_SEED = 42
+DATAGEN_CHUNK_SIZE = 10000
+# Release dates count back from a fixed day so runs on different days match
+DATAGEN_REFERENCE_DATE = date(2025, 1, 1)
+# A Sunday, the first day of a %U week
+DATAGEN_START_DATE = date(2024, 11, 3)
+ZIPF_EXPONENT = 1.1
+# Share of the popularity ranking reshuffled from one week to the next
+WEEKLY_CHURN = 0.1
+
+TITLE_PREFIXES = ["The Adventure", "Mystery of the", "Journey to", "Tales of", "The Last", "Rise of the",
+                  "Beyond the", "Legend of", "Return to", "Escape from"]
+ADJECTIVES = ["Lost", "Hidden", "Ancient", "Dark", "Eternal", "Golden", "Sacred", "Secret",
+              "Mysterious", "Forgotten"]
+NOUNS = ["Kingdom", "World", "Paradise", "Empire", "Planet", "Galaxy", "Realm", "Mountain",
+         "Ocean", "Forest"]
+GENRES = ["Action", "Drama", "Comedy", "Sci-Fi", "Horror", "Romance", "Thriller",
+          "Adventure", "Fantasy", "Animation"]
+LANGUAGES = ["English", "Spanish", "French", "Japanese", "Korean", "Chinese", "German"]
+CONTENT_RATINGS = ["G", "PG", "PG-13", "R"]
+COMPANIES = ["Universal", "Warner Bros", "Paramount", "Sony Pictures", "Disney",
+             "Lionsgate", "Netflix", "Amazon Studios"]
+ACTORS = ["Tom Hanks", "Brad Pitt", "Leonardo DiCaprio", "Meryl Streep",
+          "Jennifer Lawrence", "Robert Downey Jr", "Emma Stone", "Morgan Freeman",
+          "Scarlett Johansson", "Chris Evans", "Samuel L. Jackson", "Anne Hathaway"]
+DIRECTORS = ["Christopher Nolan", "Martin Scorsese", "Steven Spielberg",
+             "Quentin Tarantino", "James Cameron", "Peter Jackson", "Ridley Scott",
+             "Denis Villeneuve", "David Fincher", "Greta Gerwig"]
+
+SUMMARIES = [
+    'In a world on the brink of chaos, a scientist discovers a hidden formula that could save humanity. As time runs out, she must confront her past and battle ruthless enemies to protect the future.',
+    'A young archaeologist stumbles upon ancient ruins that hold the secret to a forgotten civilization. As she deciphers the mysteries, she awakens forces that threaten to destroy the world.',
+    'A musician struggling with loss finds solace in an unexpected friendship with a mysterious stranger. Together, they discover the healing power of music and the strength to move forward.',
+    'An astronaut embarks on a perilous mission to explore a distant galaxy, only to uncover a conspiracy that shakes the foundation of everything humanity believes in.',
+    'A skilled thief assembles a team of misfits for one last score, but betrayal and unforeseen challenges turn the heist into a desperate fight for survival.',
+    'Haunted by a tragic event, a detective returns to her hometown to solve a series of chilling murders. As secrets unravel, she must face the ghosts of her own history.',
+    'A struggling artist discovers a portal to a dream world where imagination comes to life. But when dreams turn into nightmares, he must confront his fears to escape.',
+    'A retired war veteran is forced back into action when his small town is threatened by a dangerous gang. Against all odds, he rises to protect the people he loves.',
+    'In a futuristic world, a programmer creates an AI to save lives, but the creation evolves beyond control. Now, she must team up with unlikely allies to stop a technological uprising.',
+    'A young girl discovers a magical forest hidden from the modern world, filled with mythical creatures. But when the forest is threatened, she must become its unlikely guardian.',
+]
+
+POSTER_PATHS = [
+    "/3k8jv1kSAAc0rCfFGtWDDQL4dfK.jpg",
+    "/vpnVM9B6NMmQpWeZvzLvDESb2QY.jpg",
+    "/w39qKYjltCix18BwtoZ1e45usdb.jpg",
+    "/ssFS25CiYQvRJqErqaEyHuVgyH7.jpg",
+    "/spWV1eRzlDxvai8LbxwAWR0Vst4.jpg",
+    "/pnXLFioDeftqjlCVlRmXvIdMsdP.jpg",
+    "/ouCgGNEC7zOIreWIt3ivgzI8XGf.jpg",
+    "/jrHIKDq9xvKJhYBDvYwmAfs8qvr.jpg",
+    "/vb6qzT0egUPHcmUwusPNl9j943p.jpg",
+    "/2uNW4WbgBXL25BAbXGLnLqX71Sw.jpg",
+    "/ys0jZr0quHERDUEoCboGQEKPvgQ.jpg",
+    "/qpdFKDvJS7oLKTcBLXOaMwUESbs.jpg",
+    "/zw4kV7npGtaqvUxvJE9IdqdFsNc.jpg",
+    "/xBJnIvRdL0nDHgvivr6EgBQizes.jpg",
+    "/7fR3KxswtY8OHHZuOUB9td58CRX.jpg",
+    "/6izwz7rsy95ARzTR3poZ8H6c5pp.jpg",
+    "/jEvytxNa5mfW7VAUmDWsZtIdATc.jpg",
+    "/uQhYBxOVFU6s9agD49FnGHwJqG5.jpg",
+    "/1MJNcPZy46hIy2CmSqOeru0yr5C.jpg",
+    "/mQC3nIJ9DQ74t9vFzUjqP8eohgX.jpg",
+    "/4YZpsylmjHbqeWzjKpUEF8gcLNW.jpg",
+    "/aosm8NMQ3UyoBVpSxyimorCQykC.jpg",
+    "/ht8Uv9QPv9y7K0RvUyJIaXOZTfd.jpg",
+    "/wTnV3PCVW5O92JMrFvvrRcV39RU.jpg",
+    "/2cxhvwyEwRlysAmRH4iodkvo0z5.jpg",
+    "/c5Tqxeo1UpBvnAc3csUm7j3hlQl.jpg",
+    "/xFSIygDiX70Esp9dheCgGX0Nj77.jpg",
+    "/ory8WuAqznTE7lfopTSymHpop2t.jpg",
+    "/l1175hgL5DoXnqeZQCcU3eZIdhX.jpg",
+    "/wIGJnIFQlESkC2rLpfA8EDHqk4g.jpg",
+    "/cNtAslrDhk1i3IOZ16vF7df6lMy.jpg",
+    "/bx92hl70NUhojjO3eV6LqKllj4L.jpg",
+    "/8cdWjvZQUExUUTzyp4t6EDMubfO.jpg",
+    "/y1xm0jMIlx9Oo2a3jWNyLGm43sJ.jpg",
+    "/lqoMzCcZYEFK729d6qzt349fB4o.jpg",
+    "/4dRtXjk1rcsZlaMJpBn6Nh9cTfO.jpg",
+    "/cdqLnri3NEGcmfnqwk2TSIYtddg.jpg",
+    "/b33nnKl1GSFbao4l3fZDDqsMx0F.jpg",
+    "/qbkAqmmEIZfrCO8ZQAuIuVMlWoV.jpg",
+    "/wWba3TaojhK7NdycRhoQpsG0FaH.jpg",
+    "/ty8TGRuvJLPUmAR1H1nRIsgwvim.jpg",
+    "/i77OInTKcrnRlAozFOaB6D5mk15.jpg",
+    "/7Z2K08J0WantJHNa0vLTOmii41l.jpg",
+    "/hq1EaYIqUNrPM3QFYAbnH2UHoX8.jpg",
+    "/ooHEL3XyLYu3hus5cMnpjeH4e7A.jpg",
+    "/hhiR6uUbTYYvKoACkdAIQPS5c6f.jpg",
+    "/w46Vw536HwNnEzOa7J24YH9DPRS.jpg",
+    "/oGythE98MYleE6mZlGs5oBGkux1.jpg",
+    "/b2YL2kncIqlcDcqly78AsOPJi6r.jpg",
+    "/dzDMewC0Hwv01SROiWgKOi4iOc1.jpg",
+    "/uCkANtG6ezb7hjRKVudY3PUcbvn.jpg",
+    "/gBenxR01Uy0Ev9RTIw6dVBPoyQU.jpg",
+    "/jvug7Esd89yNLJwGvUfeQ9j69cE.jpg",
+    "/8XsQVmGQukwIVDM88Aa0C7L5hCp.jpg",
+    "/raDMchyq3dJMqso2TVh75A123Xb.jpg",
+    "/d8Ryb8AunYAuycVKDp5HpdWPKgC.jpg",
+    "/8fYluTtB3b3HKO7KQa5tzrvGaps.jpg",
+    "/zPOOyw6HBb5Qo6uaWJ5UxrBR6Ll.jpg",
+    "/hf94ySIzdP3KwHau9VSWh7b7Qu2.jpg",
+    "/hklQwv6QVoOp5bWyh1bjuF2ydyG.jpg",
+    "/kDp1vUBnMpe8ak4rjgl3cLELqjU.jpg",
+    "/xNLiMNyFzKTL9PVIEulG55Hei8j.jpg",
+    "/m5x8D0bZ3eKqIVWZ5y7TnZ2oTVg.jpg",
+    "/blRsgsexoBqnjcEJkV8beKAVT6J.jpg",
+    "/7d8VB7xZcsjClsE6JaUr8BCbkCh.jpg",
+    "/8rdB1wkheEMMqcY8qLAKjCMPcnZ.jpg",
+    "/58QT4cPJ2u2TqWZkterDq9q4yxQ.jpg",
+    "/hzrvol8K2VWm2BsDTwb8YvRMzIH.jpg",
+    "/p6AbOJvMQhBmffd0PIv0u8ghWeY.jpg",
+    "/kKgQzkUCnQmeTPkyIwHly2t6ZFI.jpg",
+    "/oqhaffnQqSzdLrYAQA5W4IdAoCX.jpg",
+    "/nUKfbKv4RD1YxlsNWd0BwabEf3P.jpg",
+    "/AmUs3hximCKa90sHuIRr5Bz8ci5.jpg",
+    "/pXENxAzOBrTSDJGxDcUnlNTNmWr.jpg",
+    "/o8qtMeCskitW5QwSu6O1nP4jN6z.jpg",
+    "/oEJC05CqPugMxC4rFu9r6r6vg6m.jpg",
+    "/8Sok3HNA3r1GHnK2lCytHyBz1A.jpg",
+    "/xbKFv4KF3sVYuWKllLlwWDmuZP7.jpg",
+    "/ilMXOocCCwPWCcDLLa6M0ga8vWt.jpg",
+    "/92olhXYaIX6lvB8jwFz4OSfPaKq.jpg",
+    "/gKkl37BQuKTanygYQG1pyYgLVgf.jpg",
+    "/z1p34vh7dEOnLDmyCrlUVLuoDzd.jpg",
+    "/kYp5C3oIHV98E5NnObCuadLyOml.jpg",
+    "/cfkcrKySRyJiIdLo6c6kNSyLFh7.jpg",
+    "/dFu8oHN805ZRzpQZNOjkiLzMbep.jpg",
+    "/f6PfAXtFEkJRcBtOjbzOgz8qqSK.jpg",
+    "/1iPuEIcybEc9Y6aKJ8BGAnMadFX.jpg",
+    "/ae434jM5NG2kKX1rRkG5giMhpPI.jpg",
+    "/5ikADeVa7HAEOMmi0CZWiT95KHl.jpg",
+    "/3bhkrj58Vtu7enYsRolD1fZdja1.jpg",
+    "/hU42CRk14JuPEdqZG3AWmagiPAP.jpg",
+    "/7SBOaeKcPsvquHKhyKUN8gZ4tzo.jpg",
+    "/9cqNxx0GxF0bflZmeSMuL5tnGzr.jpg",
+    "/pjnD08FlMAIXsfOLKQbvmO0f0MD.jpg",
+    "/vZloFAK7NmvMGKE7VkF5UHaz0I.jpg",
+    "/iADOJ8Zymht2JPMoy3R7xceZprc.jpg",
+    "/1Bc9VNd9CIHIyJtPKFqSQzrXWru.jpg",
+    "/fiVW06jE7z9YnO4trhaMEdclSiC.jpg",
+    "/6oom5QYQ2yQTMJIbnvbkBL9cHo6.jpg",
+    "/wuMc08IPKEatf9rnMNXvIDxqP4W.jpg",
+]
+
+
+def chunk_rng(seed, chunk):
+    """Independent generator per chunk, so any chunk can be produced on its own"""
+    return np.random.default_rng([seed, chunk])
+
+
+def sample_mask(rng, n, pool_size, low, high):
+    """Bitmask per row of between low and high distinct pool entries"""
+    counts = rng.integers(low, high + 1, n)
+    draws = rng.random((n, pool_size))
+    threshold = np.sort(draws, axis=1)[np.arange(n), counts - 1]
+    return ((draws <= threshold[:, None]) * (1 << np.arange(pool_size))).sum(axis=1).astype(np.uint16)
+
+
+def generate_movie_columns(start, n, seed=DATAGEN_SEED, chunk=0):
+    """Columns of movies start+1 .. start+n; strings are indexes into POOLS, multi-valued fields bitmasks"""
+    rng = chunk_rng(seed, chunk)
+    days_back = rng.integers(0, 365 * 20 + 1, n)
+    return {
+        "number": np.arange(start + 1, start + n + 1, dtype=np.int64),
+        "title_prefix": rng.integers(0, len(TITLE_PREFIXES), n, dtype=np.uint8),
+        "adjective": rng.integers(0, len(ADJECTIVES), n, dtype=np.uint8),
+        "noun": rng.integers(0, len(NOUNS), n, dtype=np.uint8),
+        "summary_actor": rng.integers(0, len(ACTORS), n, dtype=np.uint8),
+        "release_date": np.datetime64(DATAGEN_REFERENCE_DATE, "D") - days_back.astype("timedelta64[D]"),
+        "runtime": rng.integers(90, 181, n, dtype=np.int16),
+        "budget": np.round(rng.uniform(1000000, 200000000, n), 2),
+        "revenue": np.round(rng.uniform(5000000, 500000000, n), 2),
+        "genres": sample_mask(rng, n, len(GENRES), 1, 3),
+        "production_companies": sample_mask(rng, n, len(COMPANIES), 1, 2),
+        "cast": sample_mask(rng, n, len(ACTORS), 3, 5),
+        "director": rng.integers(0, len(DIRECTORS), n, dtype=np.uint8),
+        "keywords": rng.integers(1, 21, (n, 5), dtype=np.uint8),
+        "imdb_rating": np.round(rng.uniform(5.0, 9.5, n), 1),
+        "content_rating": rng.integers(0, len(CONTENT_RATINGS), n, dtype=np.uint8),
+        "language": rng.integers(0, len(LANGUAGES), n, dtype=np.uint8),
+        "popularity_score": np.round(rng.uniform(1, 100, n), 2),
+        "views": rng.integers(1000, 1000001, n, dtype=np.int64),
+        "average_rating": np.round(rng.uniform(3.0, 5.0, n), 1),
+    }
+
+
+def mask_lookup(pool):
+    """Every bitmask over a small pool decoded to its list of entries"""
+    return [[item for bit, item in enumerate(pool) if mask >> bit & 1] for mask in range(1 << len(pool))]
+
+
+GENRE_MASKS = mask_lookup(GENRES)
+COMPANY_MASKS = mask_lookup(COMPANIES)
+ACTOR_MASKS = mask_lookup(ACTORS)
+
+
+def columns_to_movies(columns):
+    """Turn a chunk of columns into movie dicts shaped like MovieMetadata rows"""
+    release_dates = columns["release_date"].astype(str).tolist()
+    rows = {name: values.tolist() for name, values in columns.items() if name != "release_date"}
+    for i, number in enumerate(rows["number"]):
+        movie_id = f"mov_{number}"
+        if number <= len(SUMMARIES):
+            plot_summary = SUMMARIES[number - 1]
+        else:
+            plot_summary = (f"In this compelling story, {ACTORS[rows['summary_actor'][i]]} stars as the protagonist "
+                            f"who must overcome incredible odds in a world where nothing is as it seems.")
+        yield {
+            "movie_id": movie_id,
+            "title": f"{TITLE_PREFIXES[rows['title_prefix'][i]]} {ADJECTIVES[rows['adjective'][i]]} "
+                     f"{NOUNS[rows['noun'][i]]}",
+            "plot_summary": plot_summary,
+            "release_date": release_dates[i],
+            "runtime": rows["runtime"][i],
+            "budget": rows["budget"][i],
+            "revenue": rows["revenue"][i],
+            "genres": GENRE_MASKS[rows["genres"][i]],
+            "production_companies": COMPANY_MASKS[rows["production_companies"][i]],
+            "cast": ACTOR_MASKS[rows["cast"][i]],
+            "director": DIRECTORS[rows["director"][i]],
+            "keywords": [f"keyword_{keyword}" for keyword in rows["keywords"][i]],
+            "streaming_url": f"https://stream.example.com/movie/{movie_id}",
+            "trailer_url": f"https://trailers.example.com/{movie_id}",
+            "poster_url": f"https://image.tmdb.org/t/p/w500{POSTER_PATHS[number % len(POSTER_PATHS)]}",
+            "imdb_rating": rows["imdb_rating"][i],
+            "content_rating": CONTENT_RATINGS[rows["content_rating"][i]],
+            "language": LANGUAGES[rows["language"][i]],
+            "popularity_score": rows["popularity_score"][i],
+            "views": rows["views"][i],
+            "average_rating": rows["average_rating"][i],
+        }
+
+
+def iter_movie_chunks(count, seed=DATAGEN_SEED, chunk_size=DATAGEN_CHUNK_SIZE):
+    for chunk, start in enumerate(range(0, count, chunk_size)):
+        columns = generate_movie_columns(start, chunk_size, seed, chunk)
+        # Always drawn in full, so a catalog's first movies match those of any larger one
+        n = min(chunk_size, count - start)
+        yield columns if n == chunk_size else {name: values[:n] for name, values in columns.items()}
+
+
+def generate_movies(count, seed=DATAGEN_SEED, chunk_size=DATAGEN_CHUNK_SIZE):
+    """Stream count movie dicts, the same ones for the same seed and chunk size"""
+    for columns in iter_movie_chunks(count, seed, chunk_size):
+        yield from columns_to_movies(columns)
+
+
+def zipf_cdf(n, exponent=ZIPF_EXPONENT):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+def iter_play_chunks(movies, weeks, events_per_week, start=DATAGEN_START_DATE, seed=DATAGEN_SEED,
+                     chunk_size=DATAGEN_CHUNK_SIZE * 10, exponent=ZIPF_EXPONENT, churn=WEEKLY_CHURN):
+    """Chunks of (bucket, movie numbers, epoch seconds) play events, Zipfian over the catalog.
+
+    Weeks start on the Sunday on or before start, like week_bucket's; the week of New Year's Day
+    spans two buckets and its events are split between them.
+    """
+    cdf = zipf_cdf(movies, exponent)
+    rng = np.random.default_rng([seed, movies])
+    # ranking[r] is the movie number at popularity rank r
+    ranking = rng.permutation(movies) + 1
+    start -= timedelta(days=(start.weekday() + 1) % 7)
+    for week in range(weeks):
+        # UTC, so timestamps don't depend on the host's timezone
+        week_start = datetime.combine(start + timedelta(weeks=week), datetime.min.time(), tzinfo=timezone.utc)
+        # (first second, bucket) of each bucket the week's days fall into
+        buckets = []
+        for day in range(7):
+            moment = week_start + timedelta(days=day)
+            if not buckets or week_bucket(moment) != buckets[-1][1]:
+                buckets.append((int(moment.timestamp()), week_bucket(moment)))
+        if week:
+            reshuffled = rng.choice(movies, int(movies * churn), replace=False)
+            ranking[reshuffled] = ranking[rng.permutation(reshuffled)]
+        for offset in range(0, events_per_week, chunk_size):
+            n = min(chunk_size, events_per_week - offset)
+            ranks = np.searchsorted(cdf, rng.random(n), side="right")
+            numbers = ranking[np.minimum(ranks, movies - 1)]
+            timestamps = np.sort(int(week_start.timestamp()) + rng.integers(0, 7 * 24 * 3600, n))
+            bounds = [0, *np.searchsorted(timestamps, [second for second, _ in buckets[1:]]), n]
+            for (_, bucket), lo, hi in zip(buckets, bounds, bounds[1:]):
+                if hi > lo:
+                    yield bucket, numbers[lo:hi], timestamps[lo:hi]
+
+
+def write_ndjson(path, records):
+    out = sys.stdout if path == "-" else open(path, "w")
+    written = 0
+    try:
+        for record in records:
+            out.write(json.dumps(record))
+            out.write("\n")
+            written += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return written
+
+
+def write_npz_chunks(path, chunks):
+    """One compressed .npz file per chunk in the directory path"""
+    os.makedirs(path, exist_ok=True)
+    written = 0
+    for part, columns in enumerate(chunks):
+        np.savez_compressed(os.path.join(path, f"part-{part:05d}.npz"), **columns)
+        written += max(len(values) for values in columns.values() if np.ndim(values))
+    return written
+
+
+def read_movies(path):
+    """Stream movie dicts back from an NDJSON file or a directory of .npz chunks"""
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            with np.load(os.path.join(path, name)) as columns:
+                yield from columns_to_movies(dict(columns))
+    else:
+        with open(path) as f:
+            for line in f:
+                yield json.loads(line)
+
+
+def read_play_events(path):
+    """Stream (bucket, movie_id, timestamp) play events from an NDJSON file or a directory of .npz chunks"""
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            with np.load(os.path.join(path, name)) as columns:
+                bucket = str(columns["bucket"])
+                for number, timestamp in zip(columns["movie"].tolist(), columns["timestamp"].tolist()):
+                    yield bucket, f"mov_{number}", timestamp
+    else:
+        with open(path) as f:
+            for line in f:
+                event = json.loads(line)
+                yield event["bucket"], event["movie_id"], event["timestamp"]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic catalog or play-event trace")
+    parser.add_argument("kind", choices=["movies", "plays"])
+    parser.add_argument("--out", required=True, help="file for ndjson ('-' for stdout), directory for npz")
+    parser.add_argument("--format", choices=["ndjson", "npz"], default="ndjson")
+    parser.add_argument("--seed", type=int, default=DATAGEN_SEED)
+    parser.add_argument("--count", type=int, default=200, help="movies to generate")
+    parser.add_argument("--movies", type=int, default=200, help="catalog size the play events draw from")
+    parser.add_argument("--weeks", type=int, default=4)
+    parser.add_argument("--events-per-week", type=int, default=100000)
+    parser.add_argument("--start", type=date.fromisoformat, default=DATAGEN_START_DATE)
+    parser.add_argument("--zipf", type=float, default=ZIPF_EXPONENT)
+    args = parser.parse_args()
+
+    started = datetime.now()
+    if args.kind == "movies":
+        if args.format == "npz":
+            written = write_npz_chunks(args.out, iter_movie_chunks(args.count, args.seed))
+        else:
+            written = write_ndjson(args.out, generate_movies(args.count, args.seed))
+    else:
+        chunks = iter_play_chunks(args.movies, args.weeks, args.events_per_week, args.start, args.seed,
+                                  exponent=args.zipf)
+        if args.format == "npz":
+            written = write_npz_chunks(args.out, (
+                {"bucket": np.array(bucket), "movie": movies, "timestamp": timestamps}
+                for bucket, movies, timestamps in chunks
+            ))
+        else:
+            written = write_ndjson(args.out, (
+                {"bucket": bucket, "movie_id": f"mov_{number}", "timestamp": timestamp}
+                for bucket, movies, timestamps in chunks
+                for number, timestamp in zip(movies.tolist(), timestamps.tolist())
+            ))
+    seconds = (datetime.now() - started).total_seconds()
+    print(f"Wrote {written} {args.kind} to {args.out} in {seconds:.1f}s ({written / seconds:.0f}/s)", file=sys.stderr)
@@ -0,0 +1,205 @@
+"""
+Content-addressed on-disk cache of sentence embeddings.
+
+Vectors are keyed on a hash of the model name and the text, so an unchanged
+plot summary is never encoded twice, across reloads and reindexes. The store is
+two append-only files:
+
+- vectors.f32: float32 rows, memory-mapped for reads
+- keys.idx: one 16-byte digest per row, loaded into a dict on open
+
+Every process that imports db_handler opens the same store. Appends, compaction
+and the repair on open hold an exclusive flock on store.lock, rows are numbered
+from the file size under that lock, and keys appended by other processes are
+picked up before each lookup.
+
+    python embedding_store.py stats
+    python embedding_store.py compact     # drop vectors of texts no longer in PostgreSQL
+"""
+import fcntl
+import hashlib
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+EMBEDDING_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_store")
+EMBEDDING_DIMS = 384
+DIGEST_SIZE = 16
+
+
+class EmbeddingStore:
+    def __init__(self, path=EMBEDDING_STORE_DIR, model_name="", dims=EMBEDDING_DIMS):
+        self.path = path
+        self.model_name = model_name
+        self.dims = dims
+        self.row_bytes = dims * 4
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.keys_path = os.path.join(path, "keys.idx")
+        self.lock_path = os.path.join(path, "store.lock")
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "encode_seconds": 0.0}
+        self.index = {}
+        # (inode, rows) of keys.idx as loaded into index; a new inode means it was compacted
+        self.loaded = (None, 0)
+        self.vectors = None
+        self.open()
+
+    @contextmanager
+    def file_lock(self):
+        """Exclusive across processes (flock) and across threads of this one"""
+        with self.lock, open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def open(self):
+        os.makedirs(self.path, exist_ok=True)
+        with self.file_lock():
+            for file_path in (self.vectors_path, self.keys_path):
+                if not os.path.exists(file_path):
+                    open(file_path, "wb").close()
+            self.repair()
+            self.refresh()
+
+    def repair(self):
+        """Vectors are written before their keys; drop a tail left behind by an interrupted append.
+
+        Only safe while holding file_lock, when no other append can be in progress.
+        """
+        rows = os.path.getsize(self.keys_path) // DIGEST_SIZE
+        with open(self.keys_path, "r+b") as f:
+            f.truncate(rows * DIGEST_SIZE)
+        if os.path.getsize(self.vectors_path) > rows * self.row_bytes:
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(rows * self.row_bytes)
+        return rows
+
+    def refresh(self):
+        """Load keys appended by other processes, or reload everything after a compaction.
+
+        Called under file_lock, so keys.idx and vectors.f32 are never seen mid-compaction.
+        """
+        stat = os.stat(self.keys_path)
+        inode, loaded_rows = self.loaded
+        rows = stat.st_size // DIGEST_SIZE
+        if stat.st_ino == inode and rows == loaded_rows:
+            return
+        if stat.st_ino != inode:
+            self.index, loaded_rows = {}, 0
+        with open(self.keys_path, "rb") as f:
+            f.seek(loaded_rows * DIGEST_SIZE)
+            # Complete digests only; their vectors are already on disk
+            keys = f.read((rows - loaded_rows) * DIGEST_SIZE)
+        rows = loaded_rows + len(keys) // DIGEST_SIZE
+        for i in range(rows - loaded_rows):
+            self.index[keys[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE]] = loaded_rows + i
+        self.loaded = (stat.st_ino, rows)
+        self.remap()
+
+    def remap(self):
+        rows = self.loaded[1]
+        if rows:
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dims))
+        else:
+            self.vectors = np.empty((0, self.dims), dtype=np.float32)
+
+    def key(self, text):
+        return hashlib.blake2b(
+            f"{self.model_name}\0{text}".encode("utf-8"), digest_size=DIGEST_SIZE
+        ).digest()
+
+    def encode(self, get_model, texts, batch_size=64):
+        """Return embeddings for texts, loading the model and encoding only the ones not already stored"""
+        keys = [self.key(text) for text in texts]
+        with self.file_lock():
+            self.refresh()
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self.index and key not in missing:
+                missing[key] = text
+
+        self.stats["hits"] += len(texts) - len(missing)
+        self.stats["misses"] += len(missing)
+
+        if missing:
+            start = time.perf_counter()
+            encoded = get_model().encode(list(missing.values()), batch_size=batch_size)
+            self.stats["encode_seconds"] += time.perf_counter() - start
+            self.append(list(missing.keys()), np.asarray(encoded, dtype=np.float32))
+
+        with self.lock:
+            vectors, index = self.vectors, self.index
+            return np.array([vectors[index[key]] for key in keys], dtype=np.float32)
+
+    def append(self, keys, vectors):
+        with self.file_lock():
+            self.repair()
+            self.refresh()
+            # Another process may have stored some of these while they were being encoded
+            fresh = [i for i, key in enumerate(keys) if key not in self.index]
+            if not fresh:
+                return
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors[fresh].tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.keys_path, "ab") as f:
+                f.write(b"".join(keys[i] for i in fresh))
+                f.flush()
+                os.fsync(f.fileno())
+            # Row numbers come from the files, which now end with these rows
+            self.refresh()
+
+    def report(self):
+        """Hit rate and the encoding time the hits saved, estimated from the misses"""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        seconds_per_encode = self.stats["encode_seconds"] / self.stats["misses"] if self.stats["misses"] else 0.0
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            "seconds_saved": self.stats["hits"] * seconds_per_encode,
+            "stored_vectors": len(self.index),
+        }
+
+    def compact(self, live_texts):
+        """Rewrite the store keeping only vectors of live_texts"""
+        live_keys = {self.key(text) for text in live_texts}
+        vectors_tmp = self.vectors_path + ".tmp"
+        keys_tmp = self.keys_path + ".tmp"
+        with self.file_lock():
+            self.repair()
+            self.refresh()
+            kept = [(key, row) for key, row in self.index.items() if key in live_keys]
+            kept.sort(key=lambda item: item[1])
+            with open(vectors_tmp, "wb") as vf, open(keys_tmp, "wb") as kf:
+                for key, row in kept:
+                    vf.write(np.asarray(self.vectors[row], dtype=np.float32).tobytes())
+                    kf.write(key)
+            # Vectors first: a process that sees the new keys.idx must find the new vectors
+            os.replace(vectors_tmp, self.vectors_path)
+            os.replace(keys_tmp, self.keys_path)
+            removed = len(self.index) - len(kept)
+            self.refresh()
+        return removed
+
+
+if __name__ == '__main__':
+    from db_handler import DatabaseManager, MovieMetadata, embedding_store
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "compact":
+        db = DatabaseManager().SessionLocal()
+        try:
+            texts = [row.plot_summary or "" for row in db.query(MovieMetadata.plot_summary).yield_per(1000)]
+        finally:
+            db.close()
+        removed = embedding_store.compact(texts)
+        print(f"Removed {removed} stale vectors, {len(embedding_store.index)} left")
+    else:
+        print(f"{len(embedding_store.index)} vectors in {embedding_store.path}")
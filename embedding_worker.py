@@ -0,0 +1,204 @@
+"""
+Embedding inference outside the Flask request threads.
+
+Query texts are put on a bounded queue; a dispatcher thread groups them into
+small batches and runs model.encode in a pool of worker processes, each with
+its own copy of the model. Workers are spawned, not forked: by the time the
+pool starts, the serving process runs driver, executor and refresher threads
+whose locks a forked child could inherit held. Request threads only wait on a future, bounded by a
+per-request deadline, so a burst of semantic searches no longer holds up the
+cheap routes served by the same process.
+
+The pool is started on first use, so only the process that serves requests
+pays for it. If a worker dies the pool is broken for good; its batches fail
+and the next batch forks a new pool.
+
+EMBEDDING_WORKERS=0 encodes inline in the calling thread (the old behaviour).
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+EMBEDDING_WORKERS = int(os.environ.get("EMBEDDING_WORKERS", 2))
+EMBEDDING_QUEUE_SIZE = int(os.environ.get("EMBEDDING_QUEUE_SIZE", 64))
+EMBEDDING_BATCH_SIZE = 16
+EMBEDDING_BATCH_WAIT_SECONDS = 0.005
+EMBEDDING_TIMEOUT_SECONDS = float(os.environ.get("EMBEDDING_TIMEOUT_SECONDS", 2.0))
+
+
+class EmbeddingQueueFull(Exception):
+    """Raised when the embedding queue is at capacity"""
+
+
+class EmbeddingTimeout(Exception):
+    """Raised when an embedding is not ready before the request deadline"""
+
+
+_worker_model = None
+
+
+def _init_worker(model_name):
+    global _worker_model
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode_batch(texts):
+    return _worker_model.encode(texts, batch_size=len(texts))
+
+
+def _ping():
+    return True
+
+
+class EmbeddingService:
+    def __init__(self, model_name, workers=EMBEDDING_WORKERS, queue_size=EMBEDDING_QUEUE_SIZE,
+                 batch_size=EMBEDDING_BATCH_SIZE, batch_wait=EMBEDDING_BATCH_WAIT_SECONDS):
+        self.model_name = model_name
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.queue = queue.Queue(maxsize=queue_size)
+        # At most two batches per worker are handed to the pool; the rest waits in the bounded queue
+        self.in_flight = threading.Semaphore(max(workers, 1) * 2)
+        self.pool = None
+        self.inline_model = None
+        self.model_lock = threading.Lock()
+        self.started = False
+        self.start_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "batches": 0, "rejected": 0, "timeouts": 0, "errors": 0, "pool_restarts": 0}
+
+    def start(self):
+        """Start the worker processes; models load in the background inside each worker"""
+        with self.start_lock:
+            if self.started:
+                return
+            if self.workers > 0:
+                self.pool = self.create_pool()
+                threading.Thread(target=self.dispatch, name="embedding-dispatcher", daemon=True).start()
+            self.started = True
+
+    def create_pool(self):
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_name,)
+        )
+        pool.submit(_ping)
+        return pool
+
+    def restart_pool(self, broken):
+        """Replace the pool if it is still the broken one; concurrent failures restart it once"""
+        with self.start_lock:
+            if self.pool is not broken:
+                return
+            self.pool = self.create_pool()
+        self.count("pool_restarts")
+        print("Embedding worker pool was broken, started a new one")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def count(self, name):
+        with self.stats_lock:
+            self.stats[name] += 1
+
+    def snapshot(self):
+        with self.stats_lock:
+            return dict(self.stats)
+
+    def encode(self, text, timeout=EMBEDDING_TIMEOUT_SECONDS):
+        """Return the embedding of text, or raise EmbeddingQueueFull / EmbeddingTimeout"""
+        self.start()
+        self.count("requests")
+        if self.workers == 0:
+            with self.model_lock:
+                if self.inline_model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self.inline_model = SentenceTransformer(self.model_name)
+            return self.inline_model.encode(text)
+
+        deadline = time.monotonic() + timeout
+        future = Future()
+        try:
+            self.queue.put_nowait((text, deadline, future))
+        except queue.Full:
+            self.count("rejected")
+            raise EmbeddingQueueFull(f"Embedding queue is full ({self.queue.maxsize} pending)")
+
+        try:
+            return future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FuturesTimeout:
+            future.cancel()
+            self.count("timeouts")
+            raise EmbeddingTimeout(f"Embedding not ready within {timeout}s")
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def dispatch(self):
+        while True:
+            batch = [self.queue.get()]
+            batch_deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = batch_deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Skip requests whose caller already gave up
+            now = time.monotonic()
+            batch = [
+                (text, future) for text, deadline, future in batch
+                if deadline > now and future.set_running_or_notify_cancel()
+            ]
+            if not batch:
+                continue
+
+            self.in_flight.acquire()
+            self.count("batches")
+            pool = self.pool
+            try:
+                pool_future = pool.submit(_encode_batch, [text for text, _ in batch])
+            except BrokenProcessPool:
+                # A worker died since the last batch; retry once on a fresh pool
+                self.restart_pool(pool)
+                pool = self.pool
+                try:
+                    pool_future = pool.submit(_encode_batch, [text for text, _ in batch])
+                except Exception as e:
+                    self.in_flight.release()
+                    self.fail(batch, e)
+                    continue
+            except Exception as e:
+                self.in_flight.release()
+                self.fail(batch, e)
+                continue
+            pool_future.add_done_callback(lambda done, batch=batch, pool=pool: self.deliver(batch, done, pool))
+
+    def deliver(self, batch, done, pool):
+        self.in_flight.release()
+        try:
+            embeddings = done.result()
+        except BrokenProcessPool as e:
+            self.fail(batch, e)
+            self.restart_pool(pool)
+            return
+        except Exception as e:
+            self.fail(batch, e)
+            return
+        for (_, future), embedding in zip(batch, embeddings):
+            future.set_result(embedding)
+
+    def fail(self, batch, error):
+        self.count("errors")
+        print(f"Embedding batch failed: {str(error)}")
+        for _, future in batch:
+            future.set_exception(error)
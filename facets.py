@@ -0,0 +1,50 @@
+"""
+Facet values of the catalog, built once per catalog generation.
+
+The generation is the catalog_version row, bumped by a trigger on catalog
+writes but not by play-count folding, so reading it is one primary-key
+lookup. Readers are served the facets in memory; at most once per check
+interval one of them compares the generation and rebuilds the facets when it
+has moved. A failed check or rebuild keeps serving the previous facets.
+"""
+import threading
+import time
+
+FACETS_CHECK_INTERVAL_SECONDS = 5
+FACET_DIRECTORS_SIZE = 100
+
+
+class FacetCatalog:
+    def __init__(self, get_generation, build, check_interval=FACETS_CHECK_INTERVAL_SECONDS):
+        self.get_generation = get_generation
+        self.build = build
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.facets = None
+        self.generation = None
+        self.checked_at = float("-inf")
+        self.stats = {"builds": 0, "checks": 0, "errors": 0}
+
+    def get(self):
+        """Return the facets of the current catalog generation"""
+        if self.facets is not None and time.monotonic() - self.checked_at < self.check_interval:
+            return self.facets
+
+        with self.lock:
+            # Another reader may have checked while this one waited for the lock
+            if self.facets is not None and time.monotonic() - self.checked_at < self.check_interval:
+                return self.facets
+            try:
+                self.stats["checks"] += 1
+                generation = self.get_generation()
+                if self.facets is None or generation != self.generation:
+                    self.stats["builds"] += 1
+                    self.facets = {**self.build(), "generation": generation}
+                    self.generation = generation
+            except Exception as e:
+                self.stats["errors"] += 1
+                if self.facets is None:
+                    raise
+                print(f"Error refreshing facets, serving generation {self.generation}: {str(e)}")
+            self.checked_at = time.monotonic()
+            return self.facets
@@ -1,21 +1,108 @@
+import time
+# Taken before the heavier imports so the startup budget covers them
+STARTUP_STARTED = time.perf_counter()
+
 from flask import Flask, request, jsonify, render_template, abort
-from db_handler import DatabaseManager
+from db_handler import (
+    DatabaseManager, EMBEDDING_MODEL_NAME, ES_INDEX, MOVIE_FIELDS, CARD_FIELDS, BACKEND_PROBE_TIMEOUT_SECONDS,
+)
+from trending import week_bucket
+from sync_worker import SearchSyncWorker
+from embedding_worker import EmbeddingService, EmbeddingQueueFull, EmbeddingTimeout
+from coalesce import SingleFlight
+from admission import (
+    AdmissionController, SEMANTIC_MAX_INFLIGHT, SEMANTIC_MAX_QUEUE_DEPTH,
+    SEMANTIC_LATENCY_THRESHOLD_SECONDS, SEMANTIC_OVERLOAD_POLICY, SEMANTIC_RETRY_AFTER_SECONDS,
+)
+from playback import PositionCoalescer
+from query_builder import register_search_templates
+from watchlist import Watchlist, MAX_WATCHLIST_LOOKUPS
 from flask_cors import CORS
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+import atexit
 import json
-from sentence_transformers import SentenceTransformer
+import os
+import threading
 
 app = Flask(__name__, 
             template_folder='templates',
             static_folder='static')
 
-# Load the embedding model
-model = SentenceTransformer('all-MiniLM-L6-v2')
+# Query embeddings are computed in worker processes, off the request threads
+# The worker pool is started on the first semantic search, in the process that serves it
+embedding_service = EmbeddingService(EMBEDDING_MODEL_NAME)
+semantic_admission = AdmissionController(
+    SEMANTIC_MAX_INFLIGHT,
+    max_queue_depth=SEMANTIC_MAX_QUEUE_DEPTH,
+    latency_threshold=SEMANTIC_LATENCY_THRESHOLD_SECONDS,
+    queue_depth=embedding_service.queue_depth
+)
 
 CORS(app)  # Enable CORS for all routes
 
 # Initialize database manager
 db_manager = DatabaseManager()
+search_sync = SearchSyncWorker(db_manager)
+
+# Player heartbeats are coalesced to one Cassandra write per session every few seconds
+playback_positions = PositionCoalescer(db_manager.save_playback_position)
+playback_positions.start()
+atexit.register(playback_positions.flush_due, True)
+MAX_POSITION_LOOKUPS = 100
+
+watchlist = Watchlist(db_manager)
+
+# Concurrent identical requests to hot endpoints share one backend query
+coalescer = SingleFlight()
+TRENDING_TTL_SECONDS = 30
+TOP10_TTL_SECONDS = 10
+STALE_TTL_SECONDS = 300
+
+# The movie page fetches details, recommendations and play count concurrently,
+# each cached per movie as a fragment; a TTL of 0 disables the fragment cache
+MOVIE_PAGE_CACHE_TTL_SECONDS = float(os.environ.get("MOVIE_PAGE_CACHE_TTL_SECONDS", 60))
+MOVIE_PAGE_CACHE_MAX_ENTRIES = 10000
+MOVIE_PAGE_RECOMMENDATIONS = 3
+page_fragments = SingleFlight(shared_dir=None, max_entries=MOVIE_PAGE_CACHE_MAX_ENTRIES)
+page_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="movie-page")
+
+# Detail and card lookups served from an in-memory catalog snapshot, rebuilt when the
+# catalog generation moves; checked every CATALOG_SNAPSHOT_REFRESH_SECONDS
+CATALOG_SNAPSHOT = os.environ.get("CATALOG_SNAPSHOT", "0") == "1"
+CATALOG_SNAPSHOT_REFRESH_SECONDS = float(os.environ.get("CATALOG_SNAPSHOT_REFRESH_SECONDS", 60))
+
+# Time from process start until every backend is initialized
+STARTUP_BUDGET_SECONDS = float(os.environ.get("STARTUP_BUDGET_SECONDS", 15))
+startup_status = {"done": False, "seconds": None}
+init_lock = threading.Lock()
+init_thread = None
+# Serializes the empty-catalog check and sample load across processes
+SAMPLE_DATA_LOCK_ID = 731001
+
+# /readyz probes every backend live, at most once per READYZ_CACHE_SECONDS
+READYZ_CACHE_SECONDS = 2.0
+readiness = {"checked_at": None, "backends": {}}
+readiness_lock = threading.Lock()
+probe_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="readyz")
+
+# Debug mode runs the werkzeug reloader; FLASK_DEBUG=0 serves from a single process
+DEBUG = os.environ.get("FLASK_DEBUG", "1") != "0"
+
+def parse_fields(default):
+    """Read the fields= projection of a request; fields=all returns every catalog field"""
+    raw = request.args.get('fields')
+    if not raw:
+        return default
+    if raw == 'all':
+        return None
+    fields = [field for field in raw.split(',') if field]
+    unknown = [field for field in fields if field not in MOVIE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if 'movie_id' not in fields:
+        fields.insert(0, 'movie_id')
+    return fields
 
 # Routes for UI rendering
 @app.route('/')
@@ -29,141 +116,103 @@ def search_page():
     query = request.args.get('q', '')
     return render_template('search.html', query=query)
 
+def get_fragment(key, compute, ttl):
+    """Serve a movie page fragment from the fragment cache when it is enabled"""
+    if not MOVIE_PAGE_CACHE_TTL_SECONDS:
+        return compute()
+    return page_fragments.get(key, compute, min(ttl, MOVIE_PAGE_CACHE_TTL_SECONDS))
+
+def fragment_result(future, name, default):
+    """Result of an optional page fragment; a failed one renders as default and isn't cached"""
+    try:
+        return future.result()
+    except Exception as e:
+        print(f"Error loading {name} fragment: {str(e)}")
+        return default
+
+def load_movie_page(movie_id, fields=None, recommendation_size=MOVIE_PAGE_RECOMMENDATIONS):
+    """Details, recommendations and this week's play count of a movie, fetched concurrently and once each"""
+    details = page_executor.submit(
+        get_fragment, f"details:{movie_id}:{fields}",
+        lambda: db_manager.get_movie_details(movie_id, fields), MOVIE_PAGE_CACHE_TTL_SECONDS
+    )
+    recommendations = page_executor.submit(
+        get_fragment, f"recommendations:{movie_id}:{recommendation_size}",
+        lambda: db_manager.get_recommendations(movie_id, recommendation_size, CARD_FIELDS),
+        MOVIE_PAGE_CACHE_TTL_SECONDS
+    )
+    play_count = page_executor.submit(
+        get_fragment, f"play_count:{movie_id}",
+        lambda: db_manager.get_play_count(week_bucket(datetime.now()), movie_id), TOP10_TTL_SECONDS
+    )
+
+    movie = details.result()
+    if not movie:
+        return None
+    return {
+        "movie": movie,
+        "recommendations": fragment_result(recommendations, "recommendations", []),
+        "play_count": fragment_result(play_count, "play count", None),
+    }
+
 @app.route('/movie/<movie_id>')
 def movie_page(movie_id):
     """Render the movie details page"""
-    movie = db_manager.get_movie_details(movie_id)
-    if movie:
-        return render_template('movie_details.html', movie=movie)
+    page = load_movie_page(movie_id)
+    if page:
+        return render_template('movie_details.html', **page)
     abort(404)
 
 # API Routes
 @app.route('/api/movies/search', methods=['GET'])
 def search_movies():
     """API endpoint for searching movies"""
+    admitted_at = None
     try:
         query = request.args.get('query', '')
         semantic = request.args.get('semantic', 'false')
         page = int(request.args.get('page', 1))
         size = int(request.args.get('size', 10))
-        from_ = (page - 1) * size
         sort = request.args.get('sort', '')
         yearFrom = request.args.get('yearFrom', 0)
         yearTo = request.args.get('yearTo', 0)
-
-        # Build search query
-        search_query = {
-            "bool": {
-                "must": [],
-                "filter": []
-            }
-        }
-
-        # Add text search if query provided
-        if query:
-            if semantic == 'true':
-                query_embedding = model.encode(query).tolist()
-                search_query['bool']['must'].append({
-                    'knn': {
-                        "field": "embedding",
-                        "query_vector": query_embedding,
-                        "k": 10,
-                        "num_candidates": 100,
-                    }
-                })
-            else:
-                search_query["bool"]["must"].append({
-                    "multi_match": {
-                        "query": query,
-                        "fields": ["title^3", "plot_summary", "cast", "director"],
-                        "fuzziness": "AUTO"
-                    }
-                })
-        else:
-            search_query["bool"]["must"].append({"match_all": {}})
-
-        if yearFrom and yearTo:
-            search_query["bool"]["filter"].append({
-                "range": {
-                    "release_date": {
-                        "gte": yearFrom,
-                        "lte": yearTo,
-                        "format": "yyyy"
-                    }
-                }
-            })
-
-        # Add filters
-        for field, value in {
-            "genres": request.args.get('genres', '').split(','),
-            "language": request.args.get('languages', '').split(','),
-            "content_rating": request.args.get('contentRating'),
-            "director": request.args.get('director'),
-            "average_rating": request.args.get('rating')
-        }.items():
-            if type(value) == list:
-                value = [val for val in value if val]
-                if len(value):
-                    search_query["bool"]["filter"].append({
-                        "terms": {field: value}
-                    })
-            elif value:
-                search_query["bool"]["filter"].append({
-                    "term": {field: value}
-                })
-
-        # Execute search
-        body = {
-                "query": search_query,
-                "from": from_,
-                "size": size,
-                "sort": [],
-                "aggs": {
-                    "genres": {
-                        "terms": {
-                            "field": "genres",
-                            "size": 20
-                        }
-                    },
-                    "languages": {
-                        "terms": {
-                            "field": "language",
-                            "size": 10
-                        }
-                    },
-                    "content_ratings": {
-                        "terms": {
-                            "field": "content_rating",
-                            "size": 10
-                        }
-                    },
-                    "directors": {
-                        "terms": {
-                            "field": "director",
-                            "size": 20
-                        }
-                    }
-                },
-                "highlight": {
-                    "fields": {
-                        "title": {},
-                        "plot_summary": {}
-                    },
-                    "pre_tags": ["<mark>"],
-                    "post_tags": ["</mark>"]
-                }
-            }
-    
-        if not sort or sort == 'popularity':
-            body['sort'] = [
-                "_score",
-                {"popularity_score": {"order": "desc"}}
-            ]
-        else:
-            body["sort"] = [{sort: {"order": "asc"}}]
-        response = db_manager.es.search(
-            index="movies",
-            body=body
+        fields = parse_fields(CARD_FIELDS)
+
+        # Semantic searches are admitted only while the embedding path keeps up;
+        # otherwise they degrade to the keyword query or fail fast
+        mode = "keyword"
+        query_embedding = None
+        if query and semantic == 'true':
+            if semantic_admission.try_acquire():
+                admitted_at = time.perf_counter()
+                try:
+                    query_embedding = embedding_service.encode(query).tolist()
+                    mode = "semantic"
+                except (EmbeddingQueueFull, EmbeddingTimeout) as e:
+                    print(f"Semantic search degraded: {str(e)}")
+            if query_embedding is None:
+                if SEMANTIC_OVERLOAD_POLICY == "reject":
+                    response = jsonify({"error": "Semantic search is overloaded, retry later", "mode": "rejected"})
+                    response.headers["Retry-After"] = str(SEMANTIC_RETRY_AFTER_SECONDS)
+                    return response, 503
+                mode = "keyword_fallback"
+
+        response = db_manager.search_movies(
+            query,
+            filters={
+                "genres": request.args.get('genres', '').split(','),
+                "language": request.args.get('languages', '').split(','),
+                "content_rating": request.args.get('contentRating'),
+                "director": request.args.get('director'),
+                "average_rating": request.args.get('rating')
+            },
+            page=page,
+            size=size,
+            fields=fields,
+            query_vector=query_embedding,
+            year_from=yearFrom,
+            year_to=yearTo,
+            sort=sort
         )
 
         # Convert Elasticsearch response to dictionary
@@ -198,20 +247,44 @@ def search_movies():
                 for key, agg in response["aggregations"].items()
             }
 
-        return jsonify(results)
+        results["mode"] = mode
+        response = jsonify(results)
+        response.headers["X-Search-Mode"] = mode
+        return response
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Search error: {str(e)}")
         return jsonify({"error": str(e)}), 500
+    finally:
+        if admitted_at is not None:
+            semantic_admission.release(time.perf_counter() - admitted_at)
 
 @app.route('/api/movies/<movie_id>', methods=['GET'])
 def get_movie_details(movie_id):
     """API endpoint for getting movie details"""
     try:
-        movie = db_manager.get_movie_details(movie_id)
+        movie = db_manager.get_movie_details(movie_id, parse_fields(None))
         if movie:
             return jsonify(movie)
         return jsonify({"error": "Movie not found"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/movies/<movie_id>/page', methods=['GET'])
+def get_movie_page(movie_id):
+    """API endpoint for everything the movie page shows, in one round trip"""
+    try:
+        size = int(request.args.get('size', MOVIE_PAGE_RECOMMENDATIONS))
+        page = load_movie_page(movie_id, parse_fields(None), size)
+        if page:
+            return jsonify(page)
+        return jsonify({"error": "Movie not found"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -228,8 +301,15 @@ def load_sample_data():
 def get_genres():
     """API endpoint for getting all genres"""
     try:
-        genres = db_manager.get_all_genres()
-        return jsonify(genres)
+        return jsonify(db_manager.get_all_genres())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/facets', methods=['GET'])
+def get_facets():
+    """API endpoint for every search filter value with its movie count, built once per catalog generation"""
+    try:
+        return jsonify(db_manager.facets.get())
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -238,8 +318,15 @@ def get_trending():
     """API endpoint for getting trending movies"""
     try:
         size = int(request.args.get('size', 10))
-        trending = db_manager.get_trending_movies(size)
+        fields = parse_fields(CARD_FIELDS)
+        trending = coalescer.get(
+            f"trending:{size}:{fields}",
+            lambda: db_manager.get_trending_movies(size, fields),
+            TRENDING_TTL_SECONDS, STALE_TTL_SECONDS
+        )
         return jsonify(trending)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -248,8 +335,10 @@ def get_recommendations(movie_id):
     """API endpoint for getting movie recommendations"""
     try:
         size = int(request.args.get('size', 5))
-        recommendations = db_manager.get_recommendations(movie_id, size)
+        recommendations = db_manager.get_recommendations(movie_id, size, parse_fields(CARD_FIELDS))
         return jsonify(recommendations)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -259,8 +348,10 @@ def get_movies_by_genre(genre):
     try:
         page = int(request.args.get('page', 1))
         size = int(request.args.get('size', 10))
-        movies = db_manager.get_movies_by_genre(genre, page, size)
+        movies = db_manager.get_movies_by_genre(genre, page, size, parse_fields(CARD_FIELDS))
         return jsonify(movies)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
@@ -278,31 +369,27 @@ def insert_movie_cassandra():
         if not bucket or not movie_id:
             return jsonify({"error": "Missing bucket or movie_id"}), 400
         
-        # Check if the movie already exists in this bucket
-        check_query = "SELECT play_count FROM trending_movies WHERE bucket = %s AND movie_id = %s"
-        rows = db_manager.cassandra_session.execute(check_query, (bucket, movie_id))
-        
-        row = rows.one()
-        if row:  # Movie exists
-            # Increment play_count manually
-            current_play_count = row.play_count
-            new_play_count = current_play_count + 1
-            
-            update_query = """
-            UPDATE trending_movies SET play_count = %s WHERE bucket = %s AND movie_id = %s
-            """
-            db_manager.cassandra_session.execute(update_query, (new_play_count, bucket, movie_id))
-        else:  # Movie does not exist
-            # Insert a new row with play_count = 1
-            insert_query = """
-            INSERT INTO trending_movies (bucket, movie_id, play_count) VALUES (%s, %s, %s)
-            """
-            db_manager.cassandra_session.execute(insert_query, (bucket, movie_id, 1))
+        db_manager.record_play(bucket, movie_id)
         
         return jsonify({"message": "Movie playback event processed successfully"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
+def load_top_movies_with_details(bucket, fields):
+    """Top 10 movies of a bucket with their card fields and play counts"""
+    # Only the top 10 rows of the week are read, never the whole bucket
+    top_movies = db_manager.get_top_movies_for_bucket(bucket, 10)
+
+    # Fetch the card fields of all top movies in one query
+    cards = db_manager.get_movie_cards([movie["movie_id"] for movie in top_movies], fields)
+    detailed_movies = []
+    for movie in top_movies:
+        movie_details = cards.get(movie["movie_id"])
+        if movie_details:
+            movie_details["play_count"] = movie["play_count"]  # Add play_count to details
+            detailed_movies.append(movie_details)
+    return detailed_movies
+
 @app.route('/api/cassandra/top10_this_week', methods=['GET'])
 def top10_this_week():
     """
@@ -310,28 +397,16 @@ def top10_this_week():
     """
     try:
         # Get the current week in ISO format (e.g., "2024-W47")
-        current_week = datetime.now().strftime("%Y-W%U")
-        
-        # Query Cassandra for the current week's movies
-        query = "SELECT movie_id, play_count FROM trending_movies WHERE bucket = %s"
-        rows = db_manager.cassandra_session.execute(query, (current_week,))
-
-        # Sort movies by play_count in descending order and take the top 10
-        top_movies = sorted(
-            [{"movie_id": str(row.movie_id), "play_count": row.play_count} for row in rows],
-            key=lambda x: x['play_count'],
-            reverse=True
-        )[:10]
-
-        # Fetch detailed movie information for each movie_id
-        detailed_movies = []
-        for movie in top_movies:
-            movie_details = db_manager.get_movie_details(movie["movie_id"])
-            if movie_details:
-                movie_details["play_count"] = movie["play_count"]  # Add play_count to details
-                detailed_movies.append(movie_details)
-
+        current_week = week_bucket(datetime.now())
+        fields = parse_fields(CARD_FIELDS)
+        detailed_movies = coalescer.get(
+            f"top10_this_week:{current_week}:{fields}",
+            lambda: load_top_movies_with_details(current_week, fields),
+            TOP10_TTL_SECONDS, STALE_TTL_SECONDS
+        )
         return jsonify(detailed_movies), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -341,30 +416,177 @@ def top10_all_time():
     Retrieve the top 10 all-time trending movies.
     """
     try:
-        # Query all rows from the table
-        query = "SELECT bucket, movie_id, play_count FROM trending_movies"
-        rows = db_manager.cassandra_session.execute(query)
-
-        # Aggregate play_count across all buckets
-        movie_aggregates = {}
-        for row in rows:
-            if row.movie_id not in movie_aggregates:
-                movie_aggregates[row.movie_id] = 0
-            movie_aggregates[row.movie_id] += row.play_count
-
-        # Get the top 10 movies sorted by play_count
-        top_movies = sorted(
-            movie_aggregates.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:10]
-
-        # Format the result
-        result = [{"movie_id": str(movie_id), "play_count": play_count} for movie_id, play_count in top_movies]
+        result = coalescer.get(
+            "top10_all_time",
+            lambda: db_manager.get_top_movies_all_time(10),
+            TOP10_TTL_SECONDS, STALE_TTL_SECONDS
+        )
         return jsonify(result), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/playback/position', methods=['POST'])
+def save_playback_position():
+    """
+    Record a playback heartbeat for resume-watching.
+    """
+    try:
+        data = request.get_json()
+        user_id = data.get('user_id')
+        movie_id = data.get('movie_id')
+        position = data.get('position')
+
+        if not user_id or not movie_id or position is None:
+            return jsonify({"error": "Missing user_id, movie_id or position"}), 400
+
+        playback_positions.record(
+            user_id, movie_id, float(position), float(data.get('duration') or 0),
+            # Client clock in epoch ms orders heartbeats of one session
+            float(data.get('timestamp') or time.time() * 1000),
+            final=bool(data.get('final'))
+        )
+        return jsonify({"message": "Playback position recorded"}), 202
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/playback/positions', methods=['GET'])
+def get_playback_positions():
+    """
+    Retrieve resume positions of a user for a list of movie ids.
+    """
+    try:
+        user_id = request.args.get('user_id')
+        movie_ids = [movie_id for movie_id in request.args.get('movie_ids', '').split(',') if movie_id]
+        if not user_id or not movie_ids:
+            return jsonify({"error": "Missing user_id or movie_ids"}), 400
+        if len(movie_ids) > MAX_POSITION_LOOKUPS:
+            return jsonify({"error": f"At most {MAX_POSITION_LOOKUPS} movie_ids per request"}), 400
+
+        positions = db_manager.get_playback_positions(user_id, movie_ids)
+        # Heartbeats still waiting to be written are newer than what Cassandra has
+        for movie_id in movie_ids:
+            pending = playback_positions.get(user_id, movie_id)
+            if pending:
+                positions[movie_id] = {"position": pending[0], "duration": pending[1]}
+        return jsonify(positions), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/watchlist/add', methods=['POST'])
+def add_to_watchlist():
+    """
+    Add a movie to a user's watchlist.
+    """
+    try:
+        data = request.get_json()
+        user_id = data.get('user_id')
+        movie_id = data.get('movie_id')
+        if not user_id or not movie_id:
+            return jsonify({"error": "Missing user_id or movie_id"}), 400
+
+        watchlist.add(user_id, movie_id)
+        return jsonify({"message": "Added to watchlist"}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/watchlist/remove', methods=['POST'])
+def remove_from_watchlist():
+    """
+    Remove a movie from a user's watchlist.
+    """
+    try:
+        data = request.get_json()
+        user_id = data.get('user_id')
+        movie_id = data.get('movie_id')
+        if not user_id or not movie_id:
+            return jsonify({"error": "Missing user_id or movie_id"}), 400
+
+        watchlist.remove(user_id, movie_id)
+        return jsonify({"message": "Removed from watchlist"}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/watchlist', methods=['GET'])
+def get_watchlist():
+    """
+    List a user's watchlist, most recently added first, with movie card fields.
+    """
+    try:
+        user_id = request.args.get('user_id')
+        if not user_id:
+            return jsonify({"error": "Missing user_id"}), 400
+        fields = parse_fields(CARD_FIELDS)
+
+        items = watchlist.list(user_id)
+        movies = db_manager.get_movie_cards([item["movie_id"] for item in items], fields) if items else {}
+        return jsonify([
+            {**movies[item["movie_id"]], "added_at": item["added_at"].isoformat() if item["added_at"] else None}
+            for item in items if item["movie_id"] in movies
+        ]), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/watchlist/contains', methods=['GET'])
+def watchlist_contains():
+    """
+    Tell which of a page of movie ids are on a user's watchlist, in one lookup.
+    """
+    try:
+        user_id = request.args.get('user_id')
+        movie_ids = [movie_id for movie_id in request.args.get('movie_ids', '').split(',') if movie_id]
+        if not user_id or not movie_ids:
+            return jsonify({"error": "Missing user_id or movie_ids"}), 400
+        if len(movie_ids) > MAX_WATCHLIST_LOOKUPS:
+            return jsonify({"error": f"At most {MAX_WATCHLIST_LOOKUPS} movie_ids per request"}), 400
+
+        return jsonify(watchlist.contains(user_id, movie_ids)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/watchlist/stats', methods=['GET'])
+def get_watchlist_stats():
+    """API endpoint for watchlist lookup and cache counters"""
+    return jsonify(watchlist.snapshot()), 200
+
+@app.route('/api/sync/status', methods=['GET'])
+def get_sync_status():
+    """API endpoint for reporting how far Elasticsearch lags behind PostgreSQL"""
+    try:
+        return jsonify(search_sync.get_lag()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/coalesce/stats', methods=['GET'])
+def get_coalesce_stats():
+    """API endpoint for request coalescing counters"""
+    return jsonify(coalescer.snapshot()), 200
+
+@app.route('/api/fragments/stats', methods=['GET'])
+def get_movie_page_stats():
+    """API endpoint for movie page fragment cache counters"""
+    return jsonify(page_fragments.snapshot()), 200
+
+@app.route('/api/catalog/snapshot/stats', methods=['GET'])
+def get_catalog_snapshot_stats():
+    """API endpoint for the catalog snapshot size and hit counters"""
+    snapshot = db_manager.catalog_snapshot
+    return jsonify({
+        **db_manager.snapshot_stats,
+        "enabled": CATALOG_SNAPSHOT,
+        "movies": len(snapshot) if snapshot is not None else 0,
+        "bytes": snapshot.nbytes() if snapshot is not None else 0,
+        "generation": snapshot.generation if snapshot is not None else None,
+    }), 200
+
+@app.route('/api/admission/stats', methods=['GET'])
+def get_admission_stats():
+    """API endpoint for semantic search admission counters"""
+    return jsonify({**semantic_admission.snapshot(), "embedding": embedding_service.snapshot()}), 200
+
 # Error handlers
 # @app.errorhandler(404)
 # def not_found_error(error):
@@ -374,38 +596,141 @@ def top10_all_time():
 # def internal_error(error):
 #     return render_template('500.html'), 500
 
-def init_application():
-    """Initialize the application by setting up databases and loading initial data if needed"""
-    try:
-        # Create PostgreSQL tables
-        # print("Checking PostgreSQL connection...")
-        # db_manager.init_postgres()
-        # print("PostgreSQL tables created successfully")
-        
-        # Initialize Elasticsearch
-        print("Checking Elasticsearch connection...")
-        if not db_manager.es.indices.exists(index="movies"):
-            db_manager.init_elasticsearch()
-            print("Elasticsearch index created successfully")
-        
-        # Check if data exists
+def init_search_index():
+    """Make sure the movies index exists"""
+    print("Checking Elasticsearch connection...")
+    if not db_manager.es.indices.exists(index=ES_INDEX):
+        db_manager.init_elasticsearch()
+        print("Elasticsearch index created successfully")
+    register_search_templates(db_manager.es)
+
+def init_catalog(search_index_ready):
+    """Check PostgreSQL and load sample data if the catalog is empty"""
+    # Another process starting at the same time may be loading it already
+    with db_manager.advisory_lock(SAMPLE_DATA_LOCK_ID):
+        db_manager.init_catalog_version()
         movie_count = db_manager.get_movie_count()
-        
+
         if movie_count == 0:
+            # Sample data is written to the index too, so wait for it
+            search_index_ready.result()
             print("No data found. Loading sample data...")
             result = db_manager.load_sample_data()
             print(result)
         else:
             print(f"Found {movie_count} existing movies in database")
 
-        print("Checking Cassandra connection...")
-        db_manager.init_cassandra()
-        print("Cassandra tables created successfully")
-            
-        return True
+def init_trending_tables():
+    print("Checking Cassandra connection...")
+    db_manager.init_cassandra()
+    print("Cassandra tables created successfully")
+
+def refresh_catalog_snapshot():
+    try:
+        db_manager.refresh_catalog_snapshot()
     except Exception as e:
-        print(f"Error initializing application: {str(e)}")
-        return False
+        print(f"Error refreshing catalog snapshot: {str(e)}")
+
+def start_catalog_snapshot():
+    """Load the catalog snapshot if it isn't yet and keep it in step with the catalog.
+
+    Threads don't survive a fork, so every serving process starts its own refresher. It only
+    rebuilds when the catalog generation moves; until then the preloaded pages stay shared.
+    """
+    refresh_catalog_snapshot()
+
+    def run():
+        while True:
+            time.sleep(CATALOG_SNAPSHOT_REFRESH_SECONDS)
+            refresh_catalog_snapshot()
+    threading.Thread(target=run, name="catalog-snapshot", daemon=True).start()
+
+def init_application():
+    """Initialize the application by setting up databases and loading initial data if needed"""
+    # Backends are initialized concurrently, so one slow backend doesn't hold up the others
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        search_index_ready = executor.submit(
+            db_manager.check_backend, "elasticsearch", init_search_index
+        )
+        trending_ready = executor.submit(
+            db_manager.check_backend, "cassandra", init_trending_tables
+        )
+        catalog_ready = executor.submit(
+            db_manager.check_backend, "postgres", lambda: init_catalog(search_index_ready)
+        )
+
+    if CATALOG_SNAPSHOT and not catalog_ready.exception():
+        start_catalog_snapshot()
+
+    startup_status["seconds"] = time.perf_counter() - STARTUP_STARTED
+    startup_status["done"] = True
+
+    ok = True
+    for name, future in (("Elasticsearch", search_index_ready), ("PostgreSQL", catalog_ready), ("Cassandra", trending_ready)):
+        if future.exception():
+            print(f"Error initializing {name}: {str(future.exception())}")
+            ok = False
+
+    print(f"Startup took {startup_status['seconds']:.2f}s (budget {STARTUP_BUDGET_SECONDS}s)")
+    if startup_status["seconds"] > STARTUP_BUDGET_SECONDS:
+        print(f"Warning: startup exceeded its {STARTUP_BUDGET_SECONDS}s budget")
+    return ok
+
+def start_initialization():
+    """Initialize the backends in the background, once per process"""
+    global init_thread
+    if init_thread is not None:
+        return
+    with init_lock:
+        if init_thread is None:
+            init_thread = threading.Thread(target=init_application, name="init-application", daemon=True)
+            init_thread.start()
+
+@app.before_request
+def ensure_initialized():
+    # WSGI servers import the app without running __main__; the first request, a probe
+    # included, starts initialization there
+    start_initialization()
+
+def probe_backends():
+    """Live readiness of every backend, probed concurrently and cached briefly"""
+    with readiness_lock:
+        checked_at = readiness["checked_at"]
+        if checked_at is not None and time.monotonic() - checked_at < READYZ_CACHE_SECONDS:
+            return readiness["backends"]
+        futures = {name: probe_executor.submit(db_manager.probe_backend, name) for name in db_manager.backend_status}
+        wait(futures.values(), timeout=BACKEND_PROBE_TIMEOUT_SECONDS)
+        backends = {}
+        for name, future in futures.items():
+            if not future.done():
+                backends[name] = {"ready": False, "error": "timed out"}
+            elif future.exception():
+                backends[name] = {"ready": False, "error": str(future.exception())}
+            else:
+                backends[name] = {"ready": True, "error": None}
+        readiness["backends"] = backends
+        readiness["checked_at"] = time.monotonic()
+        return backends
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({"status": "ok"}), 200
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness of every backend, 503 until all of them are initialized and while any is unreachable"""
+    initialized = startup_status["done"] and all(status["ready"] for status in db_manager.backend_status.values())
+    live = probe_backends()
+    ready = initialized and all(status["ready"] for status in live.values())
+    body = {
+        "ready": ready,
+        "backends": db_manager.backend_status,
+        "live": live,
+        "startup_seconds": startup_status["seconds"],
+        "startup_budget_seconds": STARTUP_BUDGET_SECONDS,
+    }
+    return jsonify(body), 200 if ready else 503
 
 # Custom template filters
 @app.template_filter('format_date')
@@ -437,13 +762,23 @@ def format_money(amount):
     except:
         return amount
 
+# A WSGI server that imports the app before forking its workers (e.g. gunicorn --preload) builds
+# the snapshot once here, in the master, and the workers share its pages. Embedding workers
+# spawned from `python movapp.py` import this module as __mp_main__ and need no snapshot.
+if CATALOG_SNAPSHOT and __name__ not in ('__main__', '__mp_main__'):
+    refresh_catalog_snapshot()
+
 if __name__ == '__main__':
     print("Initializing Media Streaming Service...")
-    if init_application():
-        print("Initialization successful - Starting server...")
-        # For development
-        app.run(debug=True, port=5002, host='0.0.0.0')
-        # For production, use this instead:
-        # app.run(port=5000, host='0.0.0.0')
-    else:
-        print("Failed to initialize application")
+    # Serve /healthz and /readyz right away; backends finish initializing in the background.
+    # The debug reloader runs this module in a watching parent too, which never serves
+    if not DEBUG or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        # Built before serving, so the first requests are already served from memory
+        if CATALOG_SNAPSHOT:
+            refresh_catalog_snapshot()
+        start_initialization()
+    print("Starting server...")
+    # For development
+    app.run(debug=DEBUG, port=5002, host='0.0.0.0')
+    # For production, use this instead:
+    # app.run(port=5000, host='0.0.0.0')
@@ -0,0 +1,84 @@
+"""
+Server-side coalescing of playback position heartbeats.
+
+Players report their position several times a second. Only the newest
+position of each (user, movie) session is kept in memory, and it is written
+to Cassandra at most once per flush interval, or right away for a final
+heartbeat (pause, end, page close). A background thread flushes positions
+that stopped receiving heartbeats.
+"""
+import threading
+import time
+
+PLAYBACK_FLUSH_INTERVAL_SECONDS = 5
+# Resume positions expire after 90 days without playback
+PLAYBACK_POSITION_TTL_SECONDS = 90 * 24 * 3600
+
+
+class PositionCoalescer:
+    def __init__(self, write, flush_interval=PLAYBACK_FLUSH_INTERVAL_SECONDS, clock=time.monotonic):
+        self.write = write
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.last_written = {}
+        self.stats = {"heartbeats": 0, "writes": 0, "dropped_out_of_order": 0, "write_errors": 0}
+
+    def record(self, user_id, movie_id, position, duration, timestamp, final=False):
+        """Take a heartbeat; write through only when the session's interval has elapsed"""
+        key = (user_id, movie_id)
+        now = self.clock()
+        with self.lock:
+            self.stats["heartbeats"] += 1
+            current = self.pending.get(key)
+            if current and current[2] > timestamp:
+                self.stats["dropped_out_of_order"] += 1
+                return
+            self.pending[key] = (position, duration, timestamp)
+            if not final and now - self.last_written.get(key, float("-inf")) < self.flush_interval:
+                return
+            value = self.pending.pop(key)
+            self.last_written[key] = now
+        self.write_position(key, value)
+
+    def get(self, user_id, movie_id):
+        """Position not yet written for a session, if any"""
+        with self.lock:
+            return self.pending.get((user_id, movie_id))
+
+    def flush_due(self, flush_all=False):
+        """Write every pending position whose session is due, and forget idle sessions"""
+        now = self.clock()
+        with self.lock:
+            due = [
+                key for key in self.pending
+                if flush_all or now - self.last_written.get(key, float("-inf")) >= self.flush_interval
+            ]
+            writes = [(key, self.pending.pop(key)) for key in due]
+            for key in due:
+                self.last_written[key] = now
+            idle = [
+                key for key, written_at in self.last_written.items()
+                if key not in self.pending and now - written_at >= self.flush_interval
+            ]
+            for key in idle:
+                del self.last_written[key]
+        for key, value in writes:
+            self.write_position(key, value)
+        return len(writes)
+
+    def write_position(self, key, value):
+        try:
+            self.write(key[0], key[1], *value)
+            self.stats["writes"] += 1
+        except Exception as e:
+            self.stats["write_errors"] += 1
+            print(f"Error saving playback position for {key}: {str(e)}")
+
+    def start(self):
+        def run():
+            while True:
+                time.sleep(1)
+                self.flush_due()
+        threading.Thread(target=run, name="playback-flusher", daemon=True).start()
@@ -0,0 +1,147 @@
+"""
+The movie search request, built in one place.
+
+The static part of the search body (aggregations, highlighting, the shape of
+the bool query) is stored in Elasticsearch as a mustache search template, so
+a search only sends the template id and a small set of parameters.
+build_search_params turns request arguments into those parameters and
+build_search_body renders the same body in Python, for clusters without the
+template and for checking both stay equivalent
+(tests/test_search_templates.py).
+"""
+import json
+
+from elasticsearch import NotFoundError
+
+# Bump the version whenever SEARCH_TEMPLATE_SOURCE changes, so old and new app versions can coexist
+SEARCH_TEMPLATE_ID = "movie_search_v1"
+SEARCH_TEXT_FIELDS = ["title^3", "plot_summary", "cast", "director"]
+SEARCH_KNN_K = 10
+SEARCH_KNN_NUM_CANDIDATES = 100
+
+SEARCH_AGGS = {
+    "genres": {"terms": {"field": "genres", "size": 20}},
+    "languages": {"terms": {"field": "language", "size": 10}},
+    "content_ratings": {"terms": {"field": "content_rating", "size": 10}},
+    "directors": {"terms": {"field": "director", "size": 20}},
+}
+SEARCH_HIGHLIGHT = {
+    "fields": {"title": {}, "plot_summary": {}},
+    "pre_tags": ["<mark>"],
+    "post_tags": ["</mark>"],
+}
+
+# Exactly one of knn, text and match_all is set, so the must array needs no separators.
+# The filter array starts with a match_all that matches everything, so every optional
+# filter can be rendered with a leading comma.
+SEARCH_TEMPLATE_SOURCE = """{
+  "from": {{from}},
+  "size": {{size}},
+  "_source": {{#toJson}}source{{/toJson}},
+  "query": {
+    "bool": {
+      "must": [
+        {{#knn}}{"knn": {"field": "embedding", "query_vector": {{#toJson}}vector{{/toJson}}, "k": %(k)d, "num_candidates": %(num_candidates)d}}{{/knn}}
+        {{#text}}{"multi_match": {"query": {{#toJson}}text{{/toJson}}, "fields": %(text_fields)s, "fuzziness": "AUTO"}}{{/text}}
+        {{#match_all}}{"match_all": {}}{{/match_all}}
+      ],
+      "filter": [
+        {"match_all": {}}
+        {{#years}}, {"range": {"release_date": {"gte": {{#toJson}}gte{{/toJson}}, "lte": {{#toJson}}lte{{/toJson}}, "format": "yyyy"}}}{{/years}}
+        {{#terms}}, {"terms": {"{{field}}": {{#toJson}}values{{/toJson}}}}{{/terms}}
+        {{#term}}, {"term": {"{{field}}": {{#toJson}}value{{/toJson}}}}{{/term}}
+      ]
+    }
+  },
+  "sort": {{#toJson}}sort{{/toJson}},
+  "aggs": %(aggs)s,
+  "highlight": %(highlight)s
+}""" % {
+    "k": SEARCH_KNN_K,
+    "num_candidates": SEARCH_KNN_NUM_CANDIDATES,
+    "text_fields": json.dumps(SEARCH_TEXT_FIELDS),
+    "aggs": json.dumps(SEARCH_AGGS),
+    "highlight": json.dumps(SEARCH_HIGHLIGHT),
+}
+
+
+def build_search_params(query=None, query_vector=None, filters=None, year_from=None, year_to=None,
+                        page=1, size=10, sort=None, source=None):
+    """Template parameters of a search; list filter values become terms, single values a term"""
+    params = {
+        "from": (page - 1) * size,
+        "size": size,
+        "source": source or {},
+        "terms": [],
+        "term": [],
+    }
+    if query and query_vector is not None:
+        params["knn"] = {"vector": query_vector}
+    elif query:
+        params["text"] = query
+    else:
+        params["match_all"] = True
+
+    if year_from and year_to:
+        params["years"] = {"gte": str(year_from), "lte": str(year_to)}
+
+    for field, value in (filters or {}).items():
+        if isinstance(value, list):
+            values = [val for val in value if val]
+            if values:
+                params["terms"].append({"field": field, "values": values})
+        elif value:
+            params["term"].append({"field": field, "value": value})
+
+    if not sort or sort == "popularity":
+        params["sort"] = ["_score", {"popularity_score": {"order": "desc"}}]
+    else:
+        params["sort"] = [{sort: {"order": "asc"}}]
+    return params
+
+
+def build_search_body(params):
+    """The body the stored template renders for params, built in Python"""
+    if "knn" in params:
+        must = {"knn": {
+            "field": "embedding",
+            "query_vector": params["knn"]["vector"],
+            "k": SEARCH_KNN_K,
+            "num_candidates": SEARCH_KNN_NUM_CANDIDATES,
+        }}
+    elif "text" in params:
+        must = {"multi_match": {"query": params["text"], "fields": SEARCH_TEXT_FIELDS, "fuzziness": "AUTO"}}
+    else:
+        must = {"match_all": {}}
+
+    filters = [{"match_all": {}}]
+    if "years" in params:
+        filters.append({"range": {"release_date": {**params["years"], "format": "yyyy"}}})
+    filters += [{"terms": {item["field"]: item["values"]}} for item in params["terms"]]
+    filters += [{"term": {item["field"]: item["value"]}} for item in params["term"]]
+
+    return {
+        "from": params["from"],
+        "size": params["size"],
+        "_source": params["source"],
+        "query": {"bool": {"must": [must], "filter": filters}},
+        "sort": params["sort"],
+        "aggs": SEARCH_AGGS,
+        "highlight": SEARCH_HIGHLIGHT,
+    }
+
+
+def register_search_templates(es):
+    """Store the search template in the cluster; safe to call on every startup"""
+    es.put_script(id=SEARCH_TEMPLATE_ID, script={"lang": "mustache", "source": SEARCH_TEMPLATE_SOURCE})
+
+
+def run_search(es, index, params, use_template=True, routing=None):
+    """Search with the stored template, registering it first if the cluster doesn't have it yet"""
+    if not use_template:
+        return es.search(index=index, body=build_search_body(params), routing=routing)
+    try:
+        return es.search_template(index=index, id=SEARCH_TEMPLATE_ID, params=params, routing=routing)
+    except NotFoundError:
+        register_search_templates(es)
+        return es.search_template(index=index, id=SEARCH_TEMPLATE_ID, params=params, routing=routing)
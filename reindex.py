@@ -0,0 +1,276 @@
+"""
+Zero-downtime rebuild of the movies search index.
+
+A new movies_v<N> index is created with load-time settings (no replicas, no
+refresh), filled from PostgreSQL, brought back to serving settings, warmed and
+only then swapped in by atomically moving the movies alias. The previous index
+is kept so a bad build can be rolled back; a legacy concrete movies index,
+which the alias has to replace, is first cloned into movies_v0.
+
+    python reindex.py                 # build movies_v<N+1> and switch the alias
+    python reindex.py --no-switch     # build and warm only
+    python reindex.py --rollback      # point the alias back to the previous version
+"""
+import sys
+import time
+
+from elasticsearch import helpers
+from sqlalchemy import func, distinct, text
+
+from db_handler import (
+    DatabaseManager, MovieMetadata, get_model, embedding_store, language_routing,
+    ES_INDEX, ES_NUMBER_OF_REPLICAS, ES_REFRESH_INTERVAL, ES_ROUTE_BY_LANGUAGE,
+)
+from sync_worker import misrouted_deletes, movie_to_doc
+
+REINDEX_BATCH_SIZE = 500
+REINDEX_HEALTH_TIMEOUT = "5m"
+
+# Queries run against the new index before it takes traffic, to load its segments and field data.
+# Only size 0 requests are kept in the request cache, so only the aggregation is cached
+WARMUP_QUERIES = [
+    {"size": 10, "query": {"match_all": {}}},
+    {"size": 0, "aggs": {"genres": {"terms": {"field": "genres", "size": 100}}}},
+    {"size": 10, "query": {"multi_match": {"query": "adventure", "fields": ["title^3", "plot_summary"]}}},
+    {"size": 10, "sort": [{"popularity_score": {"order": "desc"}}], "query": {"match_all": {}}},
+]
+
+
+class Reindexer:
+    def __init__(self, db_manager, alias=ES_INDEX):
+        self.db_manager = db_manager
+        self.es = db_manager.es
+        self.alias = alias
+
+    def list_versions(self):
+        """Return the versions of existing movies_v<N> indices, oldest first"""
+        indices = self.es.indices.get(index=f"{self.alias}_v*", ignore_unavailable=True)
+        versions = []
+        for name in indices:
+            suffix = name[len(self.alias) + 2:]
+            if suffix.isdigit():
+                versions.append(int(suffix))
+        return sorted(versions)
+
+    def get_alias_target(self):
+        """Return the index the alias currently points to, or the legacy concrete index"""
+        if self.es.indices.exists_alias(name=self.alias):
+            return next(iter(self.es.indices.get_alias(name=self.alias)))
+        if self.es.indices.exists(index=self.alias):
+            return self.alias
+        return None
+
+    def create_index(self, index):
+        body = self.db_manager.get_index_body()
+        # Load-time settings: nothing to replicate and no refreshes while bulk loading
+        body["settings"]["index"]["number_of_replicas"] = 0
+        body["settings"]["index"]["refresh_interval"] = "-1"
+        self.es.indices.create(index=index, body=body)
+
+    def generate_actions(self, index, stats):
+        db = self.db_manager.SessionLocal()
+        try:
+            batch = []
+            for movie in db.query(MovieMetadata).yield_per(REINDEX_BATCH_SIZE):
+                batch.append(movie)
+                if len(batch) >= REINDEX_BATCH_SIZE:
+                    yield from self.batch_actions(index, batch, stats)
+                    batch = []
+            if batch:
+                yield from self.batch_actions(index, batch, stats)
+        finally:
+            db.close()
+
+    def batch_actions(self, index, movies, stats):
+        start = time.perf_counter()
+        embeddings = embedding_store.encode(get_model, [movie.plot_summary or "" for movie in movies])
+        stats["embedding_seconds"] += time.perf_counter() - start
+
+        for movie, embedding in zip(movies, embeddings):
+            doc = movie_to_doc(movie)
+            doc["movie_id"] = movie.movie_id
+            doc["embedding"] = embedding.tolist()
+            action = {"_index": index, "_id": movie.movie_id, "_source": doc}
+            if ES_ROUTE_BY_LANGUAGE:
+                action["_routing"] = language_routing(movie.language)
+            yield action
+
+    def load(self, index):
+        stats = {"docs": 0, "failed": 0, "embedding_seconds": 0.0}
+        start = time.perf_counter()
+        for ok, item in helpers.streaming_bulk(
+            self.es, self.generate_actions(index, stats),
+            chunk_size=REINDEX_BATCH_SIZE, raise_on_error=False, max_retries=3
+        ):
+            if ok:
+                stats["docs"] += 1
+            else:
+                stats["failed"] += 1
+                print(f"Failed to index: {item}")
+        stats["load_seconds"] = time.perf_counter() - start
+        stats["docs_per_second"] = stats["docs"] / stats["load_seconds"] if stats["load_seconds"] else 0.0
+        return stats
+
+    def db_now(self):
+        """Current time on the database clock, which updated_at is set from"""
+        with self.db_manager.engine.connect() as conn:
+            return conn.execute(text("SELECT now()")).scalar()
+
+    def catch_up(self, index, since):
+        """Index rows changed since `since`, which the sync worker sent to the old index.
+
+        Full index actions, so movies inserted during the load are created too. Returns the
+        number of rows and the database time the pass started at, for the next pass.
+        """
+        started_at = self.db_now()
+        db = self.db_manager.SessionLocal()
+        try:
+            movies = db.query(MovieMetadata).filter(MovieMetadata.updated_at >= since).all()
+            stats = {"embedding_seconds": 0.0}
+            if movies and ES_ROUTE_BY_LANGUAGE:
+                # Movies whose language changed since the load sit under their old routing
+                self.es.indices.refresh(index=index)
+                for start in range(0, len(movies), REINDEX_BATCH_SIZE):
+                    batch = movies[start:start + REINDEX_BATCH_SIZE]
+                    deletes = misrouted_deletes(
+                        self.es, index, {movie.movie_id: language_routing(movie.language) for movie in batch}
+                    )
+                    if deletes:
+                        helpers.bulk(self.es, deletes, raise_on_error=False, max_retries=3)
+            if movies:
+                _, errors = helpers.bulk(
+                    self.es, self.batch_actions(index, movies, stats),
+                    chunk_size=REINDEX_BATCH_SIZE, raise_on_error=False, max_retries=3
+                )
+                if errors:
+                    raise Exception(f"{len(errors)} movies failed to catch up into {index}: {errors[:3]}")
+            return len(movies), started_at
+        finally:
+            db.close()
+
+    def count_source_movies(self):
+        db = self.db_manager.SessionLocal()
+        try:
+            return db.query(func.count(distinct(MovieMetadata.movie_id))).scalar()
+        finally:
+            db.close()
+
+    def finalize(self, index):
+        """Force merge while there are no replicas, then restore serving settings and wait for replicas"""
+        self.es.indices.refresh(index=index)
+        self.es.indices.forcemerge(index=index, max_num_segments=1)
+        self.es.indices.put_settings(index=index, body={
+            "index": {
+                "number_of_replicas": ES_NUMBER_OF_REPLICAS,
+                "refresh_interval": ES_REFRESH_INTERVAL,
+            }
+        })
+        self.es.cluster.health(index=index, wait_for_status="yellow", timeout=REINDEX_HEALTH_TIMEOUT)
+
+    def warm(self, index):
+        start = time.perf_counter()
+        for body in WARMUP_QUERIES:
+            if body.get("size") == 0:
+                self.es.search(index=index, body=body, request_cache=True)
+            else:
+                self.es.search(index=index, body=body)
+        return time.perf_counter() - start
+
+    def keep_legacy_index(self):
+        """Clone the legacy concrete index into movies_v0 before the alias replaces it"""
+        legacy_copy = f"{self.alias}_v0"
+        # A clone needs a write-blocked source. Writes to it until the swap fail; the catch-up
+        # after the swap sends those rows to the new index
+        self.es.indices.put_settings(index=self.alias, body={"index.blocks.write": True})
+        # Left over from a run that failed before its swap, while the legacy index was still live
+        self.es.indices.delete(index=legacy_copy, ignore_unavailable=True)
+        self.es.indices.clone(index=self.alias, target=legacy_copy, settings={"index.blocks.write": None})
+        self.es.cluster.health(index=legacy_copy, wait_for_status="yellow", timeout=REINDEX_HEALTH_TIMEOUT)
+        print(f"Kept legacy index {self.alias} as {legacy_copy} for rollback")
+        return legacy_copy
+
+    def switch_alias(self, new_index, old_index):
+        actions = [{"add": {"index": new_index, "alias": self.alias}}]
+        if old_index == self.alias:
+            # Legacy concrete index named like the alias, already cloned to movies_v0: drop it
+            # in the same atomic call
+            actions.insert(0, {"remove_index": {"index": old_index}})
+        elif old_index:
+            actions.insert(0, {"remove": {"index": old_index, "alias": self.alias}})
+        self.es.indices.update_aliases(body={"actions": actions})
+
+    def reindex(self, switch=True):
+        versions = self.list_versions()
+        new_index = f"{self.alias}_v{(versions[-1] if versions else 0) + 1}"
+        old_index = self.get_alias_target()
+        started_at = self.db_now()
+        print(f"Building {new_index} (alias currently on {old_index})")
+
+        self.create_index(new_index)
+        try:
+            stats = self.load(new_index)
+            stats["caught_up"], caught_up_at = self.catch_up(new_index, started_at)
+            self.finalize(new_index)
+            stats["warmup_seconds"] = self.warm(new_index)
+
+            if stats["failed"]:
+                raise Exception(f"{stats['failed']} movies failed to index into {new_index}")
+            # Rows changed during finalize and warmup, replayed right before the swap.
+            # Movies are never deleted, so the index can only be ahead of this count
+            expected = self.count_source_movies()
+            caught_up, caught_up_at = self.catch_up(new_index, caught_up_at)
+            stats["caught_up"] += caught_up
+            self.es.indices.refresh(index=new_index)
+            indexed = self.es.count(index=new_index)["count"]
+            if indexed < expected:
+                raise Exception(f"{new_index} has {indexed} documents, PostgreSQL has {expected}")
+
+            if switch:
+                if old_index == self.alias:
+                    stats["previous_index"] = self.keep_legacy_index()
+                self.switch_alias(new_index, old_index)
+                print(f"Alias {self.alias} now points to {new_index}")
+        except Exception:
+            print(f"Reindex failed, deleting {new_index}")
+            self.es.indices.delete(index=new_index, ignore_unavailable=True)
+            if old_index == self.alias and not self.es.indices.exists_alias(name=self.alias):
+                self.es.indices.put_settings(index=self.alias, body={"index.blocks.write": None})
+            raise
+
+        if switch:
+            # Changes the sync worker sent to the old index between the last pass and the swap
+            stats["caught_up"] += self.catch_up(new_index, caught_up_at)[0]
+
+        stats["index"] = new_index
+        stats.setdefault("previous_index", old_index)
+        return stats
+
+    def rollback(self):
+        """Point the alias back to the newest version older than the current one"""
+        current = self.get_alias_target()
+        older = [v for v in self.list_versions() if f"{self.alias}_v{v}" != current]
+        if current and current.startswith(f"{self.alias}_v"):
+            current_version = int(current[len(self.alias) + 2:])
+            older = [v for v in older if v < current_version]
+        if not older:
+            raise Exception("No previous index version to roll back to")
+
+        previous = f"{self.alias}_v{older[-1]}"
+        self.switch_alias(previous, current)
+        print(f"Alias {self.alias} rolled back from {current} to {previous}")
+        return previous
+
+
+if __name__ == '__main__':
+    reindexer = Reindexer(DatabaseManager())
+    if "--rollback" in sys.argv:
+        reindexer.rollback()
+    else:
+        result = reindexer.reindex(switch="--no-switch" not in sys.argv)
+        print(f"Indexed {result['docs']} movies into {result['index']} "
+              f"in {result['load_seconds']:.1f}s ({result['docs_per_second']:.0f} docs/s, "
+              f"{result['embedding_seconds']:.1f}s embedding), {result['failed']} failed, "
+              f"{result['caught_up']} caught up, warmup {result['warmup_seconds']:.2f}s")
+        store = embedding_store.report()
+        print(f"Embedding store: {store['hit_rate']:.1%} hit rate, {store['misses']} encoded, "
+              f"~{store['seconds_saved']:.1f}s saved")
@@ -10,9 +10,15 @@ class MoviePlayer {
             isFullscreen: false,
             quality: 'auto',
             playbackSpeed: 1,
-            subtitles: 'off'
+            subtitles: 'off',
+            movieId: null,
+            lastPositionReport: 0
         };
 
+        // Heartbeats are throttled here and coalesced again on the server
+        this.positionReportInterval = 5000;
+        this.userId = this.getUserId();
+
         this.elements = {
             container: document.getElementById('movie-player-container'),
             video: document.getElementById('video-element'),
@@ -70,6 +76,60 @@ class MoviePlayer {
                 this.hideControls();
             }
         });
+
+        // Save the position when the page goes away
+        window.addEventListener('pagehide', () => this.reportPosition(true));
+    }
+
+    getUserId() {
+        let userId = localStorage.getItem('userId');
+        if (!userId) {
+            userId = crypto.randomUUID();
+            localStorage.setItem('userId', userId);
+        }
+        return userId;
+    }
+
+    reportPosition(final = false) {
+        if (!this.elements.video || !this.state.movieId) return;
+
+        const now = Date.now();
+        if (!final && now - this.state.lastPositionReport < this.positionReportInterval) return;
+        this.state.lastPositionReport = now;
+
+        const payload = JSON.stringify({
+            user_id: this.userId,
+            movie_id: this.state.movieId,
+            position: this.elements.video.currentTime,
+            duration: this.elements.video.duration || 0,
+            timestamp: now,
+            final: final
+        });
+
+        if (final && navigator.sendBeacon) {
+            navigator.sendBeacon('/api/playback/position', new Blob([payload], { type: 'application/json' }));
+        } else {
+            fetch('/api/playback/position', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: payload
+            }).catch(error => console.error('Error saving playback position:', error));
+        }
+    }
+
+    async resumePosition(movieId) {
+        try {
+            const response = await fetch(
+                `/api/playback/positions?user_id=${encodeURIComponent(this.userId)}&movie_ids=${encodeURIComponent(movieId)}`
+            );
+            const positions = await response.json();
+            const saved = positions[movieId];
+            if (saved && this.elements.video) {
+                this.elements.video.currentTime = saved.position;
+            }
+        } catch (error) {
+            console.error('Error loading playback position:', error);
+        }
     }
 
     async loadMovie(movieId) {
@@ -79,10 +139,12 @@ class MoviePlayer {
             const movieData = await response.json();
             
             this.state.currentMovie = movieData;
+            this.state.movieId = movieId;
             
             if (this.elements.video) {
                 this.elements.video.src = movieData.streamingUrl;
                 this.elements.video.poster = movieData.poster_url;
+                this.elements.video.addEventListener('loadedmetadata', () => this.resumePosition(movieId), { once: true });
 
                 // Set up qualities if available
                 if (movieData.qualities) {
@@ -282,6 +344,8 @@ class MoviePlayer {
         if (this.elements.currentTimeDisplay) {
             this.elements.currentTimeDisplay.textContent = this.formatTime(this.state.currentTime);
         }
+
+        this.reportPosition();
     }
 
     onPlay() {
@@ -293,6 +357,7 @@ class MoviePlayer {
 
     onPause() {
         this.state.isPlaying = false;
+        this.reportPosition(true);
         if (this.elements.playButton) {
             this.elements.playButton.innerHTML = '<i class="fas fa-play"></i>';
         }
@@ -300,6 +365,7 @@ class MoviePlayer {
 
     onEnded() {
         this.state.isPlaying = false;
+        this.reportPosition(true);
         if (this.elements.playButton) {
             this.elements.playButton.innerHTML = '<i class="fas fa-redo"></i>';
         }
@@ -17,6 +17,7 @@ class MovieSearch {
             },
             isLoading: false
         };
+        this.userId = this.getUserId();
 
         // DOM Elements
         this.elements = {
@@ -76,21 +77,13 @@ class MovieSearch {
 
     async initializeFilters() {
         try {
-            // Load genres
-            const genresResponse = await fetch('/api/genres');
-            const genres = await genresResponse.json();
-            this.renderGenreFilters(genres);
-
-            // Load languages
-            const languagesResponse = await fetch('/api/movies/search?size=0');
-            const languages = await languagesResponse.json();
-            const uniqueLanguages = [...new Set(languages.aggregations.languages.buckets.map(b => b.key))];
-            this.renderLanguageFilters(uniqueLanguages);
-
-            // Set up content ratings
-            const contentRatings = ['G', 'PG', 'PG-13', 'R', 'NC-17'];
-            this.renderContentRatingFilters(contentRatings);
-
+            // Every filter value comes from one precomputed facet catalog
+            const facetsResponse = await fetch('/api/facets');
+            const facets = await facetsResponse.json();
+            this.renderGenreFilters(facets.genres.map(facet => facet.value));
+            this.renderLanguageFilters(facets.languages.map(facet => facet.value));
+            this.renderContentRatingFilters(facets.content_ratings.map(facet => facet.value));
+            this.state.yearRange = facets.years;
         } catch (error) {
             console.error('Failed to initialize filters:', error);
             throw error;
@@ -141,7 +134,9 @@ class MovieSearch {
 
     initializeYearDropdowns() {
         const currentYear = new Date().getFullYear();
-        const years = Array.from({length: 50}, (_, i) => currentYear - i);
+        const lastYear = this.state.yearRange?.max ?? currentYear;
+        const firstYear = this.state.yearRange?.min ?? currentYear - 49;
+        const years = Array.from({length: lastYear - firstYear + 1}, (_, i) => lastYear - i);
         const yearOptions = years.map(year => 
             `<option value="${year}">${year}</option>`
         ).join('');
@@ -265,6 +260,27 @@ class MovieSearch {
         this.elements.searchResults.innerHTML = data.hits.hits
             .map(hit => this.getMovieCardHTML(hit._source))
             .join('');
+        this.loadWatchlistBadges(data.hits.hits.map(hit => hit._source.movie_id));
+    }
+
+    async loadWatchlistBadges(movieIds) {
+        // One lookup for the whole page instead of one per card
+        try {
+            const params = new URLSearchParams({ user_id: this.userId, movie_ids: movieIds.join(',') });
+            const response = await fetch(`/api/watchlist/contains?${params}`);
+            if (!response.ok) return;
+
+            const membership = await response.json();
+            Object.entries(membership).forEach(([movieId, onWatchlist]) => {
+                if (onWatchlist) this.setWatchlistBadge(movieId, true);
+            });
+        } catch (error) {
+            console.error('Error loading watchlist:', error);
+        }
+    }
+
+    setWatchlistBadge(movieId, visible) {
+        document.querySelector(`[data-watchlist-badge="${movieId}"]`)?.classList.toggle('hidden', !visible);
     }
 
     getNoResultsHTML() {
@@ -285,6 +301,10 @@ class MovieSearch {
                     <img src="${movie.poster_url}" 
                          alt="${movie.title}"
                          class="w-full h-full object-cover">
+                    <span data-watchlist-badge="${movie.movie_id}"
+                          class="hidden absolute top-2 right-2 bg-red-600 text-white text-xs px-2 py-1 rounded">
+                        <i class="fas fa-check"></i> Watchlist
+                    </span>
                     <div class="absolute inset-0 bg-gradient-to-t from-black/80 to-transparent opacity-0 hover:opacity-100 transition-opacity">
                         <div class="absolute bottom-0 left-0 p-4">
                             <div class="flex items-center space-x-2 text-sm">
@@ -521,10 +541,11 @@ class MovieSearch {
                 headers: {
                     'Content-Type': 'application/json'
                 },
-                body: JSON.stringify({ movieId })
+                body: JSON.stringify({ user_id: this.userId, movie_id: movieId })
             });
             
             if (response.ok) {
+                this.setWatchlistBadge(movieId, true);
                 this.showSuccess('Added to watchlist');
             } else {
                 throw new Error('Failed to add to watchlist');
@@ -535,6 +556,15 @@ class MovieSearch {
         }
     }
 
+    getUserId() {
+        let userId = localStorage.getItem('userId');
+        if (!userId) {
+            userId = crypto.randomUUID();
+            localStorage.setItem('userId', userId);
+        }
+        return userId;
+    }
+
     showLoading() {
         this.state.isLoading = true;
         this.elements.loadingOverlay?.classList.remove('hidden');
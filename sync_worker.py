@@ -0,0 +1,370 @@
+"""
+Keeps the Elasticsearch movies index in step with PostgreSQL.
+
+Two jobs run in a loop:
+- change sync: rows whose updated_at moved past the stored watermark are sent
+  to Elasticsearch as batched partial updates; movies the index doesn't have
+  yet are indexed in full. With language routing, an update can also miss
+  because the movie's language changed: the document under the old routing
+  is deleted in the same bulk request, so the movie isn't indexed twice
+- play folding: play counts of the weeks since the last fold are folded into
+  the views and popularity_score columns, which in turn bumps updated_at so the change sync
+  carries them to Elasticsearch
+
+Both jobs are idempotent, so a batch can be retried or re-run safely.
+
+    python sync_worker.py            # run forever
+    python sync_worker.py --once     # one sync + fold pass
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+from elasticsearch import helpers
+from elasticsearch.exceptions import ConnectionError as ESConnectionError, TransportError
+from sqlalchemy import text, tuple_
+
+from db_handler import DatabaseManager, MovieMetadata, SearchSyncState, ES_INDEX, embedding_store, get_model
+from trending import weekly_partitions, week_bucket
+
+SYNC_STATE_NAME = "movies_search"
+SYNC_BATCH_SIZE = 500
+SYNC_INTERVAL_SECONDS = 10
+# Rows committed late with an older updated_at are picked up by re-reading this window
+SYNC_OVERLAP_SECONDS = 30
+SYNC_MAX_RETRIES = 5
+SYNC_RETRY_BACKOFF_SECONDS = 0.5
+
+PLAY_FOLD_INTERVAL_SECONDS = 300
+# The fold re-reads every week from the one before its last run, so a worker that was down
+# for weeks still folds every bucket it missed
+PLAY_FOLD_STATE_NAME = "play_fold"
+POPULARITY_PER_PLAY = 0.01
+
+# Columns mirrored into the search document; the embedding is only rebuilt by a reindex
+SYNCED_FIELDS = [
+    "title", "plot_summary", "release_date", "genres", "cast", "director", "keywords",
+    "language", "content_rating", "imdb_rating", "popularity_score", "views", "average_rating",
+    "runtime", "budget", "revenue", "production_companies", "streaming_url", "trailer_url",
+    "poster_url",
+]
+
+
+def misrouted_deletes(es, index, routings):
+    """Delete actions for documents of {movie_id: routing} stored under another routing value"""
+    if not routings:
+        return []
+    # An ids query without routing searches every shard, wherever the document was routed to
+    hits = es.search(
+        index=index, query={"ids": {"values": list(routings)}}, size=len(routings), source=False
+    )["hits"]["hits"]
+    return [
+        {"_op_type": "delete", "_index": hit["_index"], "_id": hit["_id"], "_routing": hit["_routing"]}
+        for hit in hits
+        if hit.get("_routing") is not None and hit["_routing"] != routings.get(hit["_id"])
+    ]
+
+
+def action_language(action):
+    doc = action.get("doc") if action.get("_op_type") == "update" else action.get("_source")
+    return (doc or {}).get("language")
+
+
+def movie_to_doc(movie):
+    """Build the search document fields of a MovieMetadata row"""
+    doc = {field: getattr(movie, field) for field in SYNCED_FIELDS}
+    if movie.release_date:
+        doc["release_date"] = movie.release_date.strftime("%Y-%m-%d")
+    return doc
+
+
+class SearchSyncWorker:
+    def __init__(self, db_manager, index=ES_INDEX, batch_size=SYNC_BATCH_SIZE):
+        self.db_manager = db_manager
+        self.index = index
+        self.batch_size = batch_size
+        self.stats = {
+            "docs_synced": 0,
+            "batches": 0,
+            "bulk_retries": 0,
+            "bulk_failures": 0,
+            "missing_docs": 0,
+            "docs_created": 0,
+            "docs_rerouted": 0,
+            "plays_scanned": 0,
+            "movies_folded": 0,
+            "last_sync_at": None,
+            "last_fold_at": None,
+        }
+
+    def get_watermark(self, db):
+        state = db.get(SearchSyncState, SYNC_STATE_NAME)
+        if state is None:
+            return datetime.min, ""
+        return state.watermark, state.watermark_movie_id
+
+    def save_watermark(self, db, watermark, movie_id):
+        state = db.get(SearchSyncState, SYNC_STATE_NAME)
+        if state is None:
+            state = SearchSyncState(name=SYNC_STATE_NAME)
+            db.add(state)
+        state.watermark = watermark
+        state.watermark_movie_id = movie_id
+        db.commit()
+
+    def update_action(self, movie):
+        """Bulk partial update of a movie's search document"""
+        action = {"_op_type": "update", "_index": self.index, "_id": movie.movie_id, "doc": movie_to_doc(movie)}
+        routing = self.db_manager.get_routing([movie.language], self.index)
+        if routing:
+            action["_routing"] = routing
+        return action
+
+    def index_actions(self, movies):
+        """Bulk index actions with the full search document of each movie, embedding included"""
+        embeddings = embedding_store.encode(get_model, [movie.plot_summary or "" for movie in movies])
+        actions = []
+        for movie, embedding in zip(movies, embeddings):
+            doc = {**movie_to_doc(movie), "movie_id": movie.movie_id, "embedding": embedding.tolist()}
+            action = {"_op_type": "index", "_index": self.index, "_id": movie.movie_id, "_source": doc}
+            routing = self.db_manager.get_routing([movie.language], self.index)
+            if routing:
+                action["_routing"] = routing
+            actions.append(action)
+        return actions
+
+    def send_bulk(self, actions):
+        """Send bulk actions, retrying transient failures with exponential backoff.
+
+        Returns the ids of partial updates that found no document.
+        """
+        missing_ids = set()
+        pending = actions
+        for attempt in range(SYNC_MAX_RETRIES + 1):
+            try:
+                _, errors = helpers.bulk(
+                    self.db_manager.es, pending, raise_on_error=False, raise_on_exception=False
+                )
+            except (ESConnectionError, TransportError) as e:
+                print(f"Bulk sync error (attempt {attempt + 1}): {str(e)}")
+                errors = None
+
+            if errors is not None:
+                retry_ids = set()
+                rerouted = False
+                for error in errors:
+                    item = next(iter(error.values()), {})
+                    error_info = item.get("error")
+                    if isinstance(error_info, dict) and error_info.get("type") == "routing_missing_exception":
+                        # The cached routing check predates an alias switch to a routed index
+                        if not rerouted:
+                            self.db_manager.index_routed(self.index, refresh=True)
+                            rerouted = True
+                        retry_ids.add(item.get("_id"))
+                    elif item.get("status") == 404 and "update" in error:
+                        # Not in the index yet, e.g. a new movie; the caller indexes it in full
+                        self.stats["missing_docs"] += 1
+                        missing_ids.add(item.get("_id"))
+                    elif item.get("status") in (429, 502, 503, 504):
+                        retry_ids.add(item.get("_id"))
+                    else:
+                        self.stats["bulk_failures"] += 1
+                        print(f"Bulk sync failed for {item.get('_id')}: {item.get('error')}")
+                pending = [action for action in pending if action["_id"] in retry_ids]
+                if rerouted:
+                    for action in pending:
+                        routing = self.db_manager.get_routing([action_language(action)], self.index)
+                        if routing:
+                            action["_routing"] = routing
+                if not pending:
+                    return missing_ids
+
+            self.stats["bulk_retries"] += 1
+            time.sleep(SYNC_RETRY_BACKOFF_SECONDS * (2 ** attempt))
+
+        raise Exception(f"Giving up on {len(pending)} search updates after {SYNC_MAX_RETRIES} retries")
+
+    def sync_changes(self):
+        """Push every row changed since the watermark to Elasticsearch, one batch at a time"""
+        db = self.db_manager.SessionLocal()
+        try:
+            watermark, watermark_movie_id = self.get_watermark(db)
+            if watermark > datetime.min + timedelta(seconds=SYNC_OVERLAP_SECONDS):
+                cursor = (watermark - timedelta(seconds=SYNC_OVERLAP_SECONDS), "")
+            else:
+                cursor = (watermark, watermark_movie_id)
+
+            synced = 0
+            while True:
+                movies = (
+                    db.query(MovieMetadata)
+                    .filter(tuple_(MovieMetadata.updated_at, MovieMetadata.movie_id) > cursor)
+                    .order_by(MovieMetadata.updated_at, MovieMetadata.movie_id)
+                    .limit(self.batch_size)
+                    .all()
+                )
+                if not movies:
+                    break
+
+                missing_ids = self.send_bulk([self.update_action(movie) for movie in movies])
+                if missing_ids:
+                    actions = self.index_actions([movie for movie in movies if movie.movie_id in missing_ids])
+                    deletes = misrouted_deletes(
+                        self.db_manager.es, self.index,
+                        {action["_id"]: action["_routing"] for action in actions if "_routing" in action}
+                    )
+                    self.send_bulk(deletes + actions)
+                    self.stats["docs_rerouted"] += len(deletes)
+                    self.stats["docs_created"] += len(missing_ids) - len(deletes)
+
+                last = movies[-1]
+                cursor = (last.updated_at, last.movie_id)
+                # Never move the watermark backwards when replaying the overlap window
+                if cursor > (watermark, watermark_movie_id):
+                    watermark, watermark_movie_id = cursor
+                    self.save_watermark(db, watermark, watermark_movie_id)
+
+                synced += len(movies)
+                self.stats["batches"] += 1
+
+            self.stats["docs_synced"] += synced
+            self.stats["last_sync_at"] = datetime.now().isoformat()
+            return synced
+        finally:
+            db.close()
+
+    def get_fold_buckets(self, now):
+        """Weekly buckets that may have changed since the last fold; every bucket on the first one"""
+        db = self.db_manager.SessionLocal()
+        try:
+            state = db.get(SearchSyncState, PLAY_FOLD_STATE_NAME)
+        finally:
+            db.close()
+        if state is None or state.watermark is None:
+            return self.db_manager.get_trending_buckets()
+        # Plays can still land in the week before the one the last fold ran in. Stepping by day
+        # catches the short buckets at a year boundary (e.g. 2024-W52 is Dec 29-31)
+        day = state.watermark - timedelta(weeks=1)
+        buckets = []
+        while day <= now:
+            if week_bucket(day) not in buckets:
+                buckets.append(week_bucket(day))
+            day += timedelta(days=1)
+        if week_bucket(now) not in buckets:
+            buckets.append(week_bucket(now))
+        return buckets
+
+    def fold_play_counts(self, buckets=None):
+        """Fold Cassandra play counts of buckets changed since the last fold into views and popularity_score"""
+        now = datetime.now()
+        save_watermark = buckets is None
+        if buckets is None:
+            buckets = self.get_fold_buckets(now)
+
+        upsert_query = text("""
+            INSERT INTO movie_play_counts (movie_id, bucket, play_count)
+            VALUES (:movie_id, :bucket, :play_count)
+            ON CONFLICT (movie_id, bucket) DO UPDATE SET play_count = EXCLUDED.play_count
+        """)
+        # Counts are absolute per bucket and folded_plays records what views already
+        # contains, so running the fold twice leaves views unchanged. Only movies played in
+        # the folded buckets are re-summed
+        fold_query = text("""
+            UPDATE movie_metadata AS m
+            SET views = m.views - m.folded_plays + t.total,
+                popularity_score = m.popularity_score + (t.total - m.folded_plays) * :per_play,
+                folded_plays = t.total,
+                updated_at = now()
+            FROM (
+                SELECT movie_id, SUM(play_count) AS total FROM movie_play_counts
+                WHERE movie_id = ANY(:movie_ids)
+                GROUP BY movie_id
+            ) AS t
+            WHERE m.movie_id = t.movie_id AND m.folded_plays <> t.total
+        """)
+
+        plays = 0
+        movie_ids = set()
+        with self.db_manager.engine.begin() as conn:
+            for bucket in buckets:
+                for table, _, _ in weekly_partitions(bucket):
+                    # Rows from before counters keep the key they were always folded under
+                    key = bucket if table == "trending_movies" else f"{bucket}:{table}"
+                    batch = []
+                    for movie_id, play_count in self.db_manager.scan_play_counts([(table, "bucket", bucket)]):
+                        batch.append({"movie_id": str(movie_id), "bucket": key, "play_count": play_count})
+                        movie_ids.add(str(movie_id))
+                        plays += play_count
+                        if len(batch) >= self.batch_size:
+                            conn.execute(upsert_query, batch)
+                            batch = []
+                    if batch:
+                        conn.execute(upsert_query, batch)
+            folded = 0
+            if movie_ids:
+                folded = conn.execute(
+                    fold_query, {"per_play": POPULARITY_PER_PLAY, "movie_ids": sorted(movie_ids)}
+                ).rowcount
+            if save_watermark:
+                # Committed with the fold, so a failed fold is retried from the same weeks
+                conn.execute(
+                    text("""
+                        INSERT INTO search_sync_state (name, watermark) VALUES (:name, :watermark)
+                        ON CONFLICT (name) DO UPDATE SET watermark = EXCLUDED.watermark
+                    """),
+                    {"name": PLAY_FOLD_STATE_NAME, "watermark": now}
+                )
+
+        self.stats["plays_scanned"] += plays
+        self.stats["movies_folded"] += folded
+        self.stats["last_fold_at"] = datetime.now().isoformat()
+        return folded
+
+    def get_lag(self):
+        """Report how far Elasticsearch is behind PostgreSQL"""
+        db = self.db_manager.SessionLocal()
+        try:
+            watermark, watermark_movie_id = self.get_watermark(db)
+            row = db.execute(
+                text("""
+                    SELECT COUNT(*) AS pending, MIN(updated_at) AS oldest
+                    FROM movie_metadata
+                    WHERE (updated_at, movie_id) > (:watermark, :movie_id)
+                """),
+                {"watermark": watermark, "movie_id": watermark_movie_id}
+            ).one()
+            lag_seconds = (datetime.now() - row.oldest).total_seconds() if row.oldest else 0.0
+            return {
+                "watermark": watermark.isoformat() if watermark > datetime.min else None,
+                "pending_changes": row.pending,
+                "lag_seconds": max(lag_seconds, 0.0),
+            }
+        finally:
+            db.close()
+
+    def run_forever(self, interval=SYNC_INTERVAL_SECONDS, fold_interval=PLAY_FOLD_INTERVAL_SECONDS):
+        next_fold = time.monotonic()
+        while True:
+            try:
+                if time.monotonic() >= next_fold:
+                    folded = self.fold_play_counts()
+                    print(f"Folded play counts into {folded} movies")
+                    next_fold = time.monotonic() + fold_interval
+
+                synced = self.sync_changes()
+                lag = self.get_lag()
+                print(f"Synced {synced} movies, lag {lag['lag_seconds']:.1f}s, stats {self.stats}")
+            except Exception as e:
+                print(f"Search sync error: {str(e)}")
+            time.sleep(interval)
+
+
+if __name__ == '__main__':
+    worker = SearchSyncWorker(DatabaseManager())
+    worker.db_manager.cassandra_session.set_keyspace('media_streaming')
+    if "--once" in sys.argv:
+        print(f"Folded play counts into {worker.fold_play_counts()} movies")
+        print(f"Synced {worker.sync_changes()} movies")
+        print(worker.get_lag())
+    else:
+        worker.run_forever()
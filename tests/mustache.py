@@ -0,0 +1,54 @@
+"""
+The subset of mustache SEARCH_TEMPLATE_SOURCE uses (variables, sections and
+the toJson function), rendered the way Elasticsearch renders stored search
+templates, so the template can be checked without a cluster.
+"""
+import json
+import re
+
+TAG = re.compile(r"\{\{([#/]?)\s*([\w.]+)\s*\}\}")
+
+
+def lookup(stack, name):
+    for context in reversed(stack):
+        if isinstance(context, dict) and name in context:
+            return context[name]
+    return None
+
+
+def render(template, params):
+    return render_section(template, [params])
+
+
+def render_section(template, stack):
+    out, pos = [], 0
+    while True:
+        match = TAG.search(template, pos)
+        if not match:
+            out.append(template[pos:])
+            return "".join(out)
+        out.append(template[pos:match.start()])
+        kind, name = match.groups()
+        if kind != "#":
+            value = lookup(stack, name)
+            # Elasticsearch escapes variables for JSON strings
+            out.append(json.dumps(str(value))[1:-1] if value is not None else "")
+            pos = match.end()
+            continue
+
+        depth, end = 1, match.end()
+        while depth:
+            tag = TAG.search(template, end)
+            if tag is None:
+                raise ValueError(f"Unclosed section {name}")
+            if tag.group(2) == name and tag.group(1):
+                depth += 1 if tag.group(1) == "#" else -1
+            end = tag.end()
+        inner = template[match.end():tag.start()]
+        if name == "toJson":
+            out.append(json.dumps(lookup(stack, inner.strip())))
+        else:
+            value = lookup(stack, name)
+            for item in value if isinstance(value, list) else [value] if value else []:
+                out.append(render_section(inner, stack + [item]))
+        pos = end
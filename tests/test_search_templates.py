@@ -0,0 +1,111 @@
+"""
+The stored search template and build_search_body must send the same request.
+
+The template is rendered locally (tests/mustache.py) for every case. Tests
+marked with the es fixture also render it in a running cluster and compare
+the results of both search paths; they are skipped without one.
+"""
+import json
+import time
+
+import pytest
+from elasticsearch import Elasticsearch
+
+import db_handler
+from db_handler import DatabaseManager, CARD_FIELDS, ES_HOST, ES_INDEX, ES_PASSWORD, ES_USER, get_source_filter
+from mustache import render
+from query_builder import (
+    SEARCH_TEMPLATE_ID, SEARCH_TEMPLATE_SOURCE, build_search_params, build_search_body, register_search_templates,
+    run_search,
+)
+
+CASES = {
+    "match_all": {},
+    "keyword": {"query": "world"},
+    "keyword_escaped": {"query": 'the "lost" kingdom \\ <b>'},
+    "semantic_knn": {"query": "space", "query_vector": [0.01] * 384},
+    "semantic_knn_filters": {"query": "space", "query_vector": [0.5] * 384, "filters": {"language": ["French"]}},
+    "terms_filters": {"query": "scientist", "filters": {"genres": ["Action", "Drama"], "language": ["English"]}},
+    "term_filters": {"filters": {"content_rating": "PG-13", "director": "Christopher Nolan"}, "sort": "title"},
+    "years_pagination": {"year_from": "1990", "year_to": "2010", "page": 2, "size": 5, "sort": "popularity"},
+    "pagination": {"query": "world", "page": 3, "size": 7},
+}
+
+
+def case_params(case):
+    return build_search_params(**case, source=get_source_filter(CARD_FIELDS))
+
+
+@pytest.mark.parametrize("case", CASES.values(), ids=CASES.keys())
+def test_template_renders_search_body(case):
+    params = case_params(case)
+    assert json.loads(render(SEARCH_TEMPLATE_SOURCE, params)) == build_search_body(params)
+
+
+def test_pagination_offsets():
+    body = build_search_body(build_search_params("world", page=3, size=7))
+    assert (body["from"], body["size"]) == (14, 7)
+
+
+class RecordingES:
+    """Renders template searches locally and records the body and routing of every search"""
+
+    def __init__(self):
+        self.requests = []
+
+    def search(self, index, body, routing=None):
+        self.requests.append((index, body, routing))
+        return type("Response", (), {"body": {}})()
+
+    def search_template(self, index, id, params, routing=None):
+        assert id == SEARCH_TEMPLATE_ID
+        return self.search(index, json.loads(render(SEARCH_TEMPLATE_SOURCE, params)), routing)
+
+
+@pytest.mark.parametrize("case", CASES.values(), ids=CASES.keys())
+def test_both_paths_send_same_request_and_routing(case, monkeypatch):
+    manager = DatabaseManager.__new__(DatabaseManager)
+    manager.es = RecordingES()
+    manager._index_routing = {ES_INDEX: (True, time.monotonic())}
+    for use_template in (True, False):
+        monkeypatch.setattr(db_handler, "ES_SEARCH_TEMPLATES", use_template)
+        manager.search_movies(**case, fields=CARD_FIELDS)
+
+    template_request, body_request = manager.es.requests
+    assert template_request == body_request
+    languages = (case.get("filters") or {}).get("language")
+    assert template_request[2] == (",".join(sorted(languages)) if languages else None)
+
+
+@pytest.fixture(scope="module")
+def es():
+    client = Elasticsearch(ES_HOST, basic_auth=(ES_USER, ES_PASSWORD), verify_certs=False, ssl_show_warn=False)
+    try:
+        available = client.ping() and client.indices.exists(index=ES_INDEX)
+    except Exception:
+        available = False
+    if not available:
+        pytest.skip("needs a running Elasticsearch with the movies index")
+    register_search_templates(client)
+    return client
+
+
+def summarize(response):
+    return (
+        response["hits"]["total"]["value"],
+        [hit["_id"] for hit in response["hits"]["hits"]],
+        {key: agg["buckets"] for key, agg in response["aggregations"].items()},
+    )
+
+
+@pytest.mark.parametrize("case", CASES.values(), ids=CASES.keys())
+def test_stored_template_renders_search_body(es, case):
+    params = case_params(case)
+    rendered = es.render_search_template(id=SEARCH_TEMPLATE_ID, params=params)["template_output"]
+    assert rendered == build_search_body(params)
+
+
+@pytest.mark.parametrize("case", CASES.values(), ids=CASES.keys())
+def test_both_paths_return_same_results(es, case):
+    params = case_params(case)
+    assert summarize(run_search(es, ES_INDEX, params)) == summarize(run_search(es, ES_INDEX, params, use_template=False))
@@ -0,0 +1,102 @@
+import heapq
+import os
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+# Number of rows requested from Cassandra per page when scanning a bucket
+TRENDING_FETCH_SIZE = 1000
+
+# How many ranked entries are materialized per bucket in trending_top
+TRENDING_TOP_K = 10
+# How often trending_rollup.py rematerializes trending_top for the weeks still receiving plays
+TRENDING_TOP_INTERVAL_SECONDS = int(os.environ.get("TRENDING_TOP_INTERVAL_SECONDS", 60))
+# Weekly play counts: counters, and absolute counts written before counters, read until they expire
+WEEKLY_COUNT_TABLES = ("trending_counts", "trending_movies")
+
+# Weekly buckets expire this long after their week ends (26 weeks)
+TRENDING_WEEKLY_TTL_SECONDS = int(os.environ.get("TRENDING_WEEKLY_TTL_SECONDS", 26 * 7 * 24 * 3600))
+# Monthly rollups expire this long after their month ends (3 years); yearly rollups are kept
+TRENDING_MONTHLY_TTL_SECONDS = int(os.environ.get("TRENDING_MONTHLY_TTL_SECONDS", 3 * 365 * 24 * 3600))
+# A period is rolled up once it ended this long ago, so late plays are counted (2 weeks)
+TRENDING_ROLLUP_DELAY_SECONDS = int(os.environ.get("TRENDING_ROLLUP_DELAY_SECONDS", 14 * 24 * 3600))
+
+# Row-like (movie_id, play_count) pair for totals aggregated in Python
+PlayTotal = namedtuple("PlayTotal", ["movie_id", "play_count"])
+
+
+def top_k_plays(rows, k=TRENDING_TOP_K):
+    """Return the k rows with the highest play_count, keeping only a k-sized heap in memory.
+
+    `rows` can be any iterable of objects with `movie_id` and `play_count`
+    attributes (e.g. a paged Cassandra ResultSet); it is consumed lazily.
+    """
+    heap = []
+    for row in rows:
+        entry = (row.play_count, str(row.movie_id))
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    return [
+        {"movie_id": movie_id, "play_count": play_count}
+        for play_count, movie_id in sorted(heap, reverse=True)
+    ]
+
+
+def week_bucket(date):
+    """Return the trending bucket a date falls into (e.g. 2024-W47)"""
+    return date.strftime("%Y-W%U")
+
+
+def _bucket_sunday(bucket):
+    try:
+        sunday = datetime.strptime(f"{bucket}-0", "%Y-W%U-%w")
+    except (TypeError, ValueError):
+        return None
+    # Weeks past the end of the year are never made by week_bucket
+    return sunday if sunday.year <= int(bucket[:4]) else None
+
+
+def bucket_start(bucket):
+    """First moment of a week bucket inside its year, or None if bucket isn't one week_bucket makes"""
+    sunday = _bucket_sunday(bucket)
+    # Week 00 can start in December of the year before
+    return max(sunday, datetime(int(bucket[:4]), 1, 1)) if sunday else None
+
+
+def bucket_end(bucket):
+    """End of a week bucket; the last week of a year ends on January 1st"""
+    sunday = _bucket_sunday(bucket)
+    return min(sunday + timedelta(weeks=1), datetime(int(bucket[:4]) + 1, 1, 1)) if sunday else None
+
+
+def bucket_month(bucket):
+    """Monthly rollup period (e.g. 2024-11) a week bucket is folded into, by the day it starts"""
+    start = bucket_start(bucket)
+    return start.strftime("%Y-%m") if start else None
+
+
+def period_end(period):
+    """End of a monthly (2024-11) or yearly (2024) rollup period"""
+    if len(period) == 4:
+        return datetime(int(period) + 1, 1, 1)
+    year, month = map(int, period.split("-"))
+    return datetime(year + month // 12, month % 12 + 1, 1)
+
+
+def ttl_until(end, ttl_seconds, now):
+    """TTL that makes a row written now expire ttl_seconds after end, so a period expires as a whole"""
+    # A TTL of 0 would mean no expiry at all
+    return max(1, int((end - now).total_seconds()) + ttl_seconds)
+
+
+def bucket_ttl(bucket, now=None):
+    """TTL for a row of a weekly bucket; buckets that aren't week_bucket strings get the full retention"""
+    end = bucket_end(bucket)
+    return ttl_until(end, TRENDING_WEEKLY_TTL_SECONDS, now or datetime.now()) if end else TRENDING_WEEKLY_TTL_SECONDS
+
+
+def weekly_partitions(bucket):
+    """(table, key column, key) partitions holding the play counts of a weekly bucket"""
+    return [(table, "bucket", bucket) for table in WEEKLY_COUNT_TABLES]
@@ -0,0 +1,133 @@
+"""
+Maintains the trending tables: top movies per week, rollups and retention.
+
+Every TRENDING_TOP_INTERVAL_SECONDS the trending_top partitions of the current
+and previous week are rematerialized from the trending_counts counters.
+
+Weekly buckets are kept TRENDING_WEEKLY_TTL_SECONDS after their week ends.
+Once a month has been over for TRENDING_ROLLUP_DELAY_SECONDS, its weekly
+buckets are summed into trending_monthly, which in turn expires
+TRENDING_MONTHLY_TTL_SECONDS after the month. Once a year is over, its months
+are summed into trending_yearly, which is kept. top10_all_time reads each
+period at its coarsest rolled-up granularity.
+
+Rollups are written as absolute totals and recorded in trending_rollups after
+their rows, so a pass can be interrupted and re-run safely. Counter rows can't
+carry a TTL, so a bucket is deleted once its month is rolled up and its
+retention has passed.
+
+    python trending_rollup.py            # run forever
+    python trending_rollup.py --once     # one top refresh and rollup pass
+"""
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from db_handler import DatabaseManager
+from trending import (
+    bucket_end, bucket_month, period_end, week_bucket, weekly_partitions,
+    TRENDING_TOP_INTERVAL_SECONDS, TRENDING_WEEKLY_TTL_SECONDS, TRENDING_MONTHLY_TTL_SECONDS, TRENDING_ROLLUP_DELAY_SECONDS,
+)
+
+ROLLUP_INTERVAL_SECONDS = 6 * 3600
+
+
+def check_retention(weekly_ttl=TRENDING_WEEKLY_TTL_SECONDS, monthly_ttl=TRENDING_MONTHLY_TTL_SECONDS,
+                    delay=TRENDING_ROLLUP_DELAY_SECONDS):
+    """Raise ValueError if a period could expire before the rollup that keeps it"""
+    if weekly_ttl <= delay + ROLLUP_INTERVAL_SECONDS:
+        raise ValueError("TRENDING_WEEKLY_TTL_SECONDS must outlast the rollup delay and interval")
+    # January has to survive until the year it belongs to is rolled up
+    if monthly_ttl <= 335 * 24 * 3600 + delay + ROLLUP_INTERVAL_SECONDS:
+        raise ValueError("TRENDING_MONTHLY_TTL_SECONDS must outlast the rest of the year and the rollup delay")
+
+
+class TrendingRollup:
+    def __init__(self, db_manager, delay=TRENDING_ROLLUP_DELAY_SECONDS, weekly_ttl=TRENDING_WEEKLY_TTL_SECONDS,
+                 monthly_ttl=TRENDING_MONTHLY_TTL_SECONDS):
+        check_retention(weekly_ttl, monthly_ttl, delay)
+        self.db_manager = db_manager
+        self.delay = timedelta(seconds=delay)
+        self.weekly_ttl = timedelta(seconds=weekly_ttl)
+        self.stats = {"months": 0, "years": 0, "buckets_dropped": 0, "last_rollup_at": None, "last_top_at": None}
+
+    def refresh_top(self, now=None):
+        """Rematerialize trending_top for the weeks that can still receive plays"""
+        now = now or datetime.now()
+        buckets = [week_bucket(now), week_bucket(now - timedelta(weeks=1))]
+        for bucket in buckets:
+            self.db_manager.materialize_top_movies(bucket)
+        self.stats["last_top_at"] = now.isoformat()
+        return buckets
+
+    def run_once(self, now=None):
+        """Roll up every month and year that is due, then delete buckets past retention; returns what was done"""
+        now = now or datetime.now()
+        rolled = self.db_manager.get_rolled_up_periods()
+        buckets_by_month = defaultdict(list)
+        for bucket in self.db_manager.get_trending_buckets():
+            month = bucket_month(bucket)
+            # Buckets that aren't week_bucket strings are never rolled up or pruned
+            if month:
+                buckets_by_month[month].append(bucket)
+
+        done = {"months": [], "years": [], "buckets_dropped": 0}
+        for month in sorted(buckets_by_month):
+            if month in rolled["month"] or period_end(month) + self.delay > now:
+                continue
+            partitions = [partition for bucket in buckets_by_month[month] for partition in weekly_partitions(bucket)]
+            movies = self.db_manager.rollup_period("month", month, partitions, now)
+            rolled["month"].add(month)
+            done["months"].append(month)
+            print(f"Rolled up {len(buckets_by_month[month])} weekly buckets of {month} ({movies} movies)")
+
+        months_by_year = defaultdict(list)
+        for month in rolled["month"]:
+            months_by_year[month[:4]].append(month)
+        for year in sorted(months_by_year):
+            if year in rolled["year"] or period_end(year) + self.delay > now:
+                continue
+            partitions = [("trending_monthly", "period", month) for month in sorted(months_by_year[year])]
+            movies = self.db_manager.rollup_period("year", year, partitions, now)
+            rolled["year"].add(year)
+            done["years"].append(year)
+            print(f"Rolled up {len(partitions)} months of {year} ({movies} movies)")
+
+        # Counters can't expire on their own, and neither can rows written before the TTL
+        for month, buckets in buckets_by_month.items():
+            if month not in rolled["month"]:
+                continue
+            for bucket in buckets:
+                if bucket_end(bucket) + self.weekly_ttl <= now:
+                    self.db_manager.drop_bucket(bucket)
+                    done["buckets_dropped"] += 1
+
+        self.stats["months"] += len(done["months"])
+        self.stats["years"] += len(done["years"])
+        self.stats["buckets_dropped"] += done["buckets_dropped"]
+        self.stats["last_rollup_at"] = now.isoformat()
+        return done
+
+    def run_forever(self, interval=ROLLUP_INTERVAL_SECONDS, top_interval=TRENDING_TOP_INTERVAL_SECONDS):
+        next_rollup = time.monotonic()
+        while True:
+            try:
+                self.refresh_top()
+                if time.monotonic() >= next_rollup:
+                    done = self.run_once()
+                    print(f"Trending rollup: {done}, stats {self.stats}")
+                    next_rollup = time.monotonic() + interval
+            except Exception as e:
+                print(f"Trending rollup error: {str(e)}")
+            time.sleep(top_interval)
+
+
+if __name__ == '__main__':
+    rollup = TrendingRollup(DatabaseManager())
+    rollup.db_manager.cassandra_session.set_keyspace('media_streaming')
+    if "--once" in sys.argv:
+        print(f"Refreshed top movies of {rollup.refresh_top()}")
+        print(rollup.run_once())
+    else:
+        rollup.run_forever()
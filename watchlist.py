@@ -0,0 +1,118 @@
+"""
+Watchlist membership with an optional in-process cache.
+
+Watchlists live in Cassandra, one partition per user. contains() answers a
+whole page of movie ids with one IN query, never by reading the partition.
+With the cache, the answers are kept per user for a short TTL, and a lookup
+only queries the ids it hasn't seen yet; listing the watchlist caches the
+full set. Adds and removes made through this process update the cache in
+place, so only changes made by other processes can be up to one TTL late.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+# 0 disables the membership cache
+WATCHLIST_CACHE_TTL_SECONDS = float(os.environ.get("WATCHLIST_CACHE_TTL_SECONDS", 30))
+WATCHLIST_CACHE_MAX_USERS = int(os.environ.get("WATCHLIST_CACHE_MAX_USERS", 10000))
+MAX_WATCHLIST_LOOKUPS = 100
+
+
+class Watchlist:
+    def __init__(self, db_manager, cache_ttl=WATCHLIST_CACHE_TTL_SECONDS, max_users=WATCHLIST_CACHE_MAX_USERS):
+        self.db_manager = db_manager
+        self.cache_ttl = cache_ttl
+        self.max_users = max_users
+        self.lock = threading.Lock()
+        self.members = OrderedDict()
+        self.stats = {"lookups": 0, "cache_hits": 0, "queries": 0}
+
+    def add(self, user_id, movie_id):
+        self.db_manager.add_to_watchlist(user_id, movie_id, datetime.now(timezone.utc))
+        self.update_cached(user_id, movie_id, True)
+
+    def remove(self, user_id, movie_id):
+        self.db_manager.remove_from_watchlist(user_id, movie_id)
+        self.update_cached(user_id, movie_id, False)
+
+    def list(self, user_id):
+        items = self.db_manager.get_watchlist(user_id)
+        self.store(user_id, {item["movie_id"] for item in items}, None)
+        return items
+
+    def contains(self, user_id, movie_ids):
+        """Map each of movie_ids to whether it is on the user's watchlist"""
+        self.stats["lookups"] += 1
+        if not movie_ids:
+            return {}
+        members, known = self.cached(user_id)
+        unknown = [movie_id for movie_id in movie_ids if known is not None and movie_id not in known]
+        if members is not None and not unknown:
+            self.stats["cache_hits"] += 1
+        else:
+            if members is None:
+                unknown = list(movie_ids)
+            self.stats["queries"] += 1
+            found = self.db_manager.get_watchlist_members(user_id, unknown)
+            members, known = self.merge(user_id, found, unknown)
+        return {movie_id: movie_id in members for movie_id in movie_ids}
+
+    def cached(self, user_id):
+        """(members, ids answered) of a user; ids answered is None once the full set is known"""
+        if not self.cache_ttl:
+            return None, None
+        with self.lock:
+            entry = self.members.get(user_id)
+            if entry is None or time.monotonic() >= entry[2]:
+                return None, None
+            self.members.move_to_end(user_id)
+            return entry[0], entry[1]
+
+    def store(self, user_id, members, known, expires_at=None):
+        if not self.cache_ttl:
+            return
+        with self.lock:
+            self.members[user_id] = (members, known, expires_at or time.monotonic() + self.cache_ttl)
+            self.members.move_to_end(user_id)
+            while len(self.members) > self.max_users:
+                self.members.popitem(last=False)
+
+    def merge(self, user_id, found, queried):
+        """Add the answer of an IN query for queried ids to the user's cached entry"""
+        found = set(found)
+        if not self.cache_ttl:
+            return found, set(queried)
+        with self.lock:
+            entry = self.members.get(user_id)
+            if entry is None or time.monotonic() >= entry[2]:
+                members, known, expires_at = set(), set(), time.monotonic() + self.cache_ttl
+            else:
+                # Copies, so a contains() running concurrently keeps consistent sets
+                members, expires_at = set(entry[0]), entry[2]
+                known = None if entry[1] is None else set(entry[1])
+            members |= found
+            members -= set(queried) - found
+            if known is not None:
+                known |= set(queried)
+        self.store(user_id, members, known, expires_at)
+        return members, known
+
+    def update_cached(self, user_id, movie_id, present):
+        with self.lock:
+            entry = self.members.get(user_id)
+            if entry is None:
+                return
+            # Copy so a contains() running concurrently keeps a consistent set
+            members = set(entry[0])
+            known = entry[1] if entry[1] is None else entry[1] | {movie_id}
+            if present:
+                members.add(movie_id)
+            else:
+                members.discard(movie_id)
+            self.members[user_id] = (members, known, entry[2])
+
+    def snapshot(self):
+        with self.lock:
+            return {**self.stats, "cached_users": len(self.members)}